@@ -0,0 +1,129 @@
+import argparse, os, time
+import numpy as np
+
+from steps.jsonl import read_jsonl
+from steps.step5_embed import load_model, encode_texts, encode_static
+from steps.embeddings import normalize_rows
+from steps.step6_canonicalize import MIN_SIM, STATIC_MIN_SIM, pool_state, prepare_pool, resolve_pool
+
+# Accuracy check for step5 backends / modes: encodes the strings of typed
+# step4 output (work/<dataset>/4_merged.jsonl) with the torch MiniLM baseline
+# and a candidate (onnx / openvino backend, static model2vec vectors, or
+# hybrid = static search + MiniLM re-rank), then runs step6 on both: the same
+# pools (entities per type, relations per (head type, tail type), pre-merged
+# as in step6) resolved seed by seed with resolve_pool, so each pool shrinks
+# as clusters are removed. The LLM is replaced by a deterministic stub that
+# merges every candidate within --stub_sim baseline cosine of the item; its
+# answers depend only on the question, so the cluster maps differ only where
+# retrieval did.
+# --min_sim sets the candidate side's cut-off (default: what run.py uses for
+# that mode), e.g. to calibrate STATIC_MIN_SIM for --backend static.
+# --lsh B,R checks step6 MinHash LSH blocking on top of the chosen vectors
+# (--backend torch measures blocking alone).
+
+def typed_pools(path):
+    # (vocab, {(kind, key): {text: vocab row}}), entity pools first as in step6
+    vocab, pools = {}, {}
+    for row in read_jsonl(path):
+        h, t = row["head"], row["tail"]
+        for kind, key, text in (("entity", h["type"], h["text"]), ("entity", t["type"], t["text"]),
+                                ("relation", (h["type"], t["type"]), row["relation"])):
+            pools.setdefault((kind, key), {})[text] = vocab.setdefault(text, len(vocab))
+    ordered = sorted(pools.items(), key=lambda kv: kv[0][0] != "entity")
+    return list(vocab), ordered
+
+def stub_asker(vecs, vocab_ids, min_sim):
+    def ask(item, candidates, item_type):
+        v = vecs[vocab_ids[item]]
+        return [c for c in candidates if float(vecs[vocab_ids[c]] @ v) >= min_sim], item
+    return ask
+
+def timed_encode(model, texts, batch_size):
+    t0 = time.time()
+    embs = encode_texts(model, texts, batch_size)
+    return normalize_rows(embs), time.time() - t0
+
+def timed_static(texts):
+    t0 = time.time()
+    embs = encode_static(texts)
+    return normalize_rows(embs), time.time() - t0
+
+def cluster_map(texts, clusters):
+    canon = {t: t for t in texts}
+    canon.update((m, c) for c, members in clusters.items() for m in members)
+    return canon
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--backend", required=True, choices=["torch", "onnx", "openvino", "static", "hybrid"])
+    ap.add_argument("--quantize", default=None)
+    ap.add_argument("--threads", type=int, default=0)
+    ap.add_argument("--work", default=None, help="pipeline work dir (default: canonicalization/work)")
+    ap.add_argument("--datasets", default=None, help="comma-separated (default: every dataset with 4_merged.jsonl)")
+    ap.add_argument("--batch_size", type=int, default=256)
+    ap.add_argument("--lsh", default=None, help="bands,rows of step6 LSH blocking for the candidate side")
+    ap.add_argument("--stub_sim", type=float, default=0.85, help="baseline cosine at which the stub LLM merges a candidate")
+    ap.add_argument("--min_sim", type=float, default=None, help="candidate-side step6 cut-off (default: MIN_SIM, STATIC_MIN_SIM for static)")
+    ap.add_argument("--no_premerge", action="store_true")
+    args = ap.parse_args()
+    lsh = tuple(int(x) for x in args.lsh.split(",")) if args.lsh else None
+    min_sim = args.min_sim if args.min_sim is not None else STATIC_MIN_SIM if args.backend == "static" else MIN_SIM
+
+    root = args.work or os.path.join(os.path.dirname(os.path.abspath(__file__)), "work")
+    names = args.datasets.split(",") if args.datasets else sorted(
+        d for d in (os.listdir(root) if os.path.isdir(root) else [])
+        if os.path.exists(os.path.join(root, d, "4_merged.jsonl"))
+    )
+    if not names:
+        raise SystemExit(f"no 4_merged.jsonl under {root}; run run.py through step4 first")
+
+    base_model = load_model("torch", threads=args.threads)
+    cand_model = load_model(args.backend, args.quantize, args.threads) if args.backend in ("onnx", "openvino") else None
+
+    for name in names:
+        texts, pools = typed_pools(os.path.join(root, name, "4_merged.jsonl"))
+        base, tb = timed_encode(base_model, texts, args.batch_size)
+        agree = ""
+        if args.backend == "torch":
+            cand, tc = base, tb
+        elif cand_model is not None:
+            cand, tc = timed_encode(cand_model, texts, args.batch_size)
+            cos = np.sum(base * cand, axis=1)
+            agree = f"cos mean={cos.mean():.4f} min={cos.min():.4f} "
+        else:
+            cand, tc = timed_static(texts)
+
+        ask = stub_asker(base, {t: i for i, t in enumerate(texts)}, args.stub_sim)
+        for kind in ("entity", "relation"):
+            n_pools = same_pools = n_items = same_items = n_clusters = same_clusters = 0
+            for (item_kind, key), pool in pools:
+                if item_kind != kind:
+                    continue
+                pool_texts, rows, _, _ = prepare_pool(key, pool, kind, None, not args.no_premerge, {}, {})
+                if not pool_texts:
+                    continue
+                base_clusters, cand_clusters = {}, {}
+                resolve_pool(pool_state(base, pool_texts, rows), kind, ask, base_clusters)
+                if args.backend == "hybrid":
+                    cand_state = pool_state(base, pool_texts, rows, static=cand, lsh=lsh, min_sim=min_sim)
+                else:
+                    cand_state = pool_state(cand, pool_texts, rows, lsh=lsh, min_sim=min_sim)
+                resolve_pool(cand_state, kind, ask, cand_clusters)
+
+                ma, mb = cluster_map(pool_texts, base_clusters), cluster_map(pool_texts, cand_clusters)
+                n_pools += 1
+                same_pools += ma == mb
+                n_items += len(pool_texts)
+                same_items += sum(ma[t] == mb[t] for t in pool_texts)
+                found = {frozenset(m) for m in cand_clusters.values()}
+                n_clusters += len(base_clusters)
+                same_clusters += sum(frozenset(m) in found for m in base_clusters.values())
+            if not n_pools:
+                continue
+            print(f"[CHECK] {name} {kind}: pools={n_pools} items={n_items} {agree}"
+                  f"identical pools={same_pools / n_pools:.1%} same canonical={same_items / n_items:.1%} "
+                  f"baseline clusters kept={same_clusters}/{n_clusters} "
+                  f"time torch={tb:.1f}s {args.backend}={tc:.1f}s ({tb / max(tc, 1e-9):.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,115 @@
 import argparse, os
+import numpy as np
 
-from steps.step1_dedup import step1
-from steps.step2_focus import step2
-from steps.step3_typing import step3
-from steps.step4_merge import step4
-from steps.step5_embed import step5
-from steps.step6_canonicalize import step6
-from steps.step7_strip import step7
-from steps.step8_restore import step8
+from steps.step1_dedup import step1, dedup_rows
+from steps.step2_focus import step2, focus_records
+from steps.step3_typing import step3, type_records
+from steps.step4_merge import step4, merge_records
+from steps.step5_embed import step5, embed_records
+from steps.step6_canonicalize import step6, canonicalize, MIN_SIM, STATIC_MIN_SIM
+from steps.step8_restore import step8, restore_rows
+from steps.triple_io import iter_rows, write_rows, TripleWriter
+from steps.embeddings import save_embeddings, vocab_path, static_path
+from steps.stamps import run_step as stamped_step
+from steps.jsonl import tee_jsonl, write_jsonl
+from steps.step_stats import profile_step, save_stats
+
+
+def tee_rows(rows, path):
+    with TripleWriter(path) as w:
+        for row in rows:
+            w.write(row)
+            yield row
+
+
+def count_items(path):
+    # records in a step output: matrix rows for .npy, lines for .jsonl, and
+    # rows for triple files (their version header is not a row)
+    if path.endswith(".npy"):
+        return int(np.load(path, mmap_mode="r").shape[0])
+    if not path.endswith(".jsonl"):
+        return sum(1 for _ in iter_rows(path))
+    n = 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            n += block.count(b"\n")
+    return n
+
+
+def profiled(stats, name, fn, output):
+    def run():
+        with profile_step(stats, name) as rec:
+            fn()
+        rec["nitm"] = count_items(output)
+    return run
+
+
+def run_in_memory(args, input_txt, output_txt, prompt_dir, embed_cache, paths, stats):
+    # steps chained as generators; work files are only written with --keep_work.
+    # Steps 1-4 interleave, so they are profiled as one.
+    p1, p2, p3, p4, p5, p6 = paths
+    keep = args.keep_work
+
+    n_rows = [0]
+
+    def counted(rows):
+        for row in rows:
+            n_rows[0] += 1
+            yield row
+
+    with profile_step(stats, "step1-4") as rec:
+        rows = counted(dedup_rows(iter_rows(input_txt)))
+        if keep:
+            rows = tee_rows(rows, p1)
+        recs = focus_records(rows)
+        if keep:
+            recs = tee_jsonl(recs, p2)
+        recs = type_records(recs, prompt_dir, args.model, args.api_base,
+                            args.type_concurrency, args.type_cache_key, args.type_local_margin)
+        if keep:
+            recs = tee_jsonl(recs, p3)
+        # step5 and step6 both need every row, so the stream is materialized here
+        data = list(merge_records(recs))
+        if keep:
+            write_jsonl(p4, data)
+        rec["nitm"] = len(data)
+    print("[STEP1-4 DONE]")
+
+    with profile_step(stats, "step5") as rec:
+        texts, vecs, static = embed_records(data, args.embed_batch_size, args.embed_workers, embed_cache,
+                                            args.embed_backend, args.embed_quantize, args.embed_threads, args.embed_mode)
+        vecs = vecs.astype(args.embed_dtype, copy=False)
+        # step6 worker processes memory-map the matrix, so it has to be on disk for them
+        emb_path = p5 if keep or args.step6_workers > 0 else None
+        if emb_path:
+            save_embeddings(p5, texts, vecs, args.embed_dtype, static)
+        rec["nitm"] = len(texts)
+    print("[STEP5 DONE]")
+
+    with profile_step(stats, "step6") as rec:
+        data = canonicalize(data, {t: i for i, t in enumerate(texts)}, vecs, args.model, args.api_base,
+                            args.llm_concurrency, args.llm_batch, not args.no_premerge,
+                            args.step6_workers, args.canon_store, emb_path, static, lsh_config(args), min_sim(args))
+        if keep:
+            write_jsonl(p6, data)
+        rec["nitm"] = len(data)
+    print("[STEP6 DONE]")
+
+    with profile_step(stats, "step8") as rec:
+        write_rows(output_txt, restore_rows(data, n_rows[0]))
+        rec["nitm"] = n_rows[0]
+    print("[STEP8 DONE]")
+
+
+def lsh_config(args):
+    return (args.lsh_bands, args.lsh_rows) if args.lsh_bands > 0 else None
+
+
+def min_sim(args):
+    # step6 candidate cut-off; static vectors have their own default
+    if args.step6_min_sim is not None:
+        return args.step6_min_sim
+    return STATIC_MIN_SIM if args.embed_mode == "static" else MIN_SIM
 
 
 def main():
@@ -15,7 +117,33 @@ def main():
     ap.add_argument("--model", required=True)
     ap.add_argument("--dataset", required=True)
     ap.add_argument("--api_base", default=None)
+    ap.add_argument("--type_concurrency", type=int, default=1, help="step3 typing batches in flight (1 = serial)")
+    ap.add_argument("--type_cache_key", default="entity", choices=["text", "entity", "entity+rel"], help="step3 label cache granularity (text = whole triple, as before)")
+    ap.add_argument("--type_local_margin", type=float, default=None, help="label step3 entities locally (embedding centroids) when the top-2 margin is at least this; off by default")
+    ap.add_argument("--embed_batch_size", type=int, default=256)
+    ap.add_argument("--embed_workers", type=int, default=0, help="CPU processes for step5 encoding (0/1 = single process)")
+    ap.add_argument("--embed_dtype", default="float32", choices=["float32", "float16"])
+    ap.add_argument("--embed_mode", default="transformer", choices=["transformer", "static", "hybrid"], help="step5 vectors: MiniLM, model2vec only, or model2vec retrieval + MiniLM re-rank")
+    ap.add_argument("--embed_backend", default="torch", choices=["torch", "onnx", "openvino"], help="step5 encoder runtime (CPU)")
+    ap.add_argument("--embed_quantize", default=None, help="int8 variant: onnx -> avx2|avx512|avx512_vnni|arm64, openvino -> qint8")
+    ap.add_argument("--embed_threads", type=int, default=0, help="intra-op threads for the step5 encoder (0 = runtime default)")
+    ap.add_argument("--embed_cache", default=None, help="SQLite embedding cache shared across runs (default: cache/embeddings.sqlite)")
+    ap.add_argument("--no_embed_cache", action="store_true")
+    ap.add_argument("--llm_concurrency", type=int, default=1, help="step6 in-flight LLM decisions (1 = serial)")
+    ap.add_argument("--llm_batch", type=int, default=1, help="step6 dedup questions per LLM request")
+    ap.add_argument("--no_premerge", action="store_true", help="send every step6 item to the LLM (no rule-based pre-merge)")
+    ap.add_argument("--step6_workers", type=int, default=0, help="processes for step6 pool retrieval (0 = in-process)")
+    ap.add_argument("--lsh_bands", type=int, default=0, help="step6 MinHash LSH bands: only score items sharing a band with the query (0 = off)")
+    ap.add_argument("--lsh_rows", type=int, default=2, help="MinHash values per LSH band (fewer rows = higher recall, larger blocks)")
+    ap.add_argument("--step6_min_sim", type=float, default=None, help=f"step6 candidate cosine cut-off (default {MIN_SIM}; {STATIC_MIN_SIM} with --embed_mode static)")
+    ap.add_argument("--step6_out_of_core", action="store_true", help="step6 resolves one pool at a time from on-disk partitions and streams the rows (memory bounded by the largest pool)")
+    ap.add_argument("--in_memory", action="store_true", help="chain the steps as generators instead of writing/reading work files")
+    ap.add_argument("--keep_work", action="store_true", help="with --in_memory, still write the intermediate work files")
+    ap.add_argument("--no_resume", action="store_true", help="run every step even if its stamp says it is up to date")
+    ap.add_argument("--canon_store", default=None, help="SQLite store of step6 decisions; reuse it to canonicalize new triples incrementally")
     args = ap.parse_args()
+    if args.step6_out_of_core and (args.in_memory or args.step6_workers > 0):
+        ap.error("--step6_out_of_core works on the work files, one pool at a time (no --in_memory / --step6_workers)")
 
     base = os.path.dirname(__file__)
 
@@ -23,6 +151,7 @@ def main():
     output_txt = f"{base}/output/{args.dataset}/triples.txt"
     work_dir = f"{base}/work/{args.dataset}"
     prompt_dir = f"{base}/prompt"
+    embed_cache = None if args.no_embed_cache else (args.embed_cache or f"{base}/cache/embeddings.sqlite")
 
     os.makedirs(work_dir, exist_ok=True)
     os.makedirs(os.path.dirname(output_txt), exist_ok=True)
@@ -31,18 +160,57 @@ def main():
     p2 = f"{work_dir}/2_focus.jsonl"
     p3 = f"{work_dir}/3_typed.jsonl"
     p4 = f"{work_dir}/4_merged.jsonl"
-    p5 = f"{work_dir}/5_embedded.jsonl"
+    p5 = f"{work_dir}/5_embeddings.npy"
     p6 = f"{work_dir}/6_canonicalized.jsonl"
-    p7 = f"{work_dir}/7_stripped.jsonl"
-
-    step1(input_txt, p1); print("[STEP1 DONE]")
-    step2(p1, p2); print("[STEP2 DONE]")
-    step3(p2, p3, prompt_dir, args.model, args.api_base); print("[STEP3 DONE]")
-    step4(p3, p4); print("[STEP4 DONE]")
-    step5(p4, p5); print("[STEP5 DONE]")
-    step6(p5, p6, args.model, args.api_base); print("[STEP6 DONE]")
-    step7(p6, p7); print("[STEP7 DONE]")
-    step8(p7, output_txt); print("[STEP8 DONE]")
+
+    # per-step wall / CPU time, peak RSS, LLM usage and cache hits
+    stats = {}
+    stats_path = f"{work_dir}/stats.json"
+
+    if args.in_memory:
+        run_in_memory(args, input_txt, output_txt, prompt_dir, embed_cache, (p1, p2, p3, p4, p5, p6), stats)
+        save_stats(stats_path, stats)
+        return
+
+    # each step is skipped while its inputs, code and output-affecting params are unchanged
+    resume = not args.no_resume
+    prompts = [f"{prompt_dir}/entity_types_v1.json", f"{prompt_dir}/fewshot_entity_typing_v1.jsonl"]
+    p5_vocab = vocab_path(p5)
+
+    def run_step(name, fn, inputs, outputs, module, params, resume):
+        if not stamped_step(name, profiled(stats, name.lower(), fn, outputs[0]), inputs, outputs, module, params, resume):
+            stats[name.lower()] = {"skipped": True}
+
+    run_step("STEP1", lambda: step1(input_txt, p1),
+             [input_txt], [p1], "step1_dedup", {}, resume)
+    run_step("STEP2", lambda: step2(p1, p2),
+             [p1], [p2], "step2_focus", {}, resume)
+    run_step("STEP3", lambda: step3(p2, p3, prompt_dir, args.model, args.api_base, args.type_concurrency, args.type_cache_key, args.type_local_margin),
+             [p2, *prompts], [p3], "step3_typing",
+             {"model": args.model, "api_base": args.api_base, "cache_key": args.type_cache_key, "local_margin": args.type_local_margin}, resume)
+    run_step("STEP4", lambda: step4(p3, p4),
+             [p3], [p4], "step4_merge", {}, resume)
+    p5_out = [p5, p5_vocab] + ([static_path(p5)] if args.embed_mode == "hybrid" else [])
+    run_step("STEP5", lambda: step5(p4, p5, args.embed_batch_size, args.embed_workers, args.embed_dtype, embed_cache,
+                                    args.embed_backend, args.embed_quantize, args.embed_threads, args.embed_mode),
+             [p4], p5_out, "step5_embed",
+             {"dtype": args.embed_dtype, "backend": args.embed_backend, "quantize": args.embed_quantize,
+              "mode": args.embed_mode}, resume)
+    # a canon store is mutable state outside the work dir, so step6 always runs with one
+    p6_in = [p4] + p5_out
+    run_step("STEP6", lambda: step6(p4, p5, p6, args.model, args.api_base, args.llm_concurrency, args.llm_batch, not args.no_premerge, args.step6_workers, args.canon_store, lsh_config(args), args.step6_out_of_core, min_sim(args)),
+             p6_in, [p6], "step6_canonicalize",
+             # parallel rounds can pick other seeds than the serial loop, so the
+             # concurrency is part of the result; worker processes are not
+             {"model": args.model, "api_base": args.api_base, "llm_concurrency": args.llm_concurrency, "llm_batch": args.llm_batch,
+              "premerge": not args.no_premerge, "lsh": lsh_config(args), "out_of_core": args.step6_out_of_core,
+              "min_sim": min_sim(args)},
+             resume and not args.canon_store)
+    # step8 is cheap and writes outside the work dir, so it is never stamped
+    # the output keeps one row per input row, including empty ones at either end
+    run_step("STEP8", lambda: step8(p6, output_txt, sum(1 for _ in iter_rows(p1))),
+             [p6], [output_txt], "step8_restore", {}, False)
+    save_stats(stats_path, stats)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,86 @@
+import math
+from collections import Counter
+
+# Inverted BM25Okapi index over a shrinking pool.
+# Scores match rank_bm25.BM25Okapi rebuilt over the live documents, but the
+# index is built once, documents can be removed, and a query only touches the
+# posting lists of its own terms.
+
+def tokenize(text):
+    return text.lower().split()
+
+class BM25Index:
+    def __init__(self, texts, k1=1.5, b=0.75, epsilon=0.25):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+
+        self.postings = {}  # term -> {doc_id: tf}
+        self.doc_terms = {}  # doc_id -> term list (for removal)
+        self.doc_len = {}
+        self.total_len = 0
+        self._avg_idf = None
+
+        for doc_id, text in enumerate(texts):
+            self.add(doc_id, text)
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    def add(self, doc_id, text):
+        tf = Counter(tokenize(text))
+        for term, n in tf.items():
+            self.postings.setdefault(term, {})[doc_id] = n
+        self.doc_terms[doc_id] = list(tf)
+        self.doc_len[doc_id] = sum(tf.values())
+        self.total_len += self.doc_len[doc_id]
+        self._avg_idf = None
+
+    def remove(self, doc_id):
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            plist = self.postings[term]
+            del plist[doc_id]
+            if not plist:
+                del self.postings[term]
+        self.total_len -= self.doc_len.pop(doc_id)
+        self._avg_idf = None
+
+    def _raw_idf(self, df):
+        n = len(self.doc_len)
+        return math.log(n - df + 0.5) - math.log(df + 0.5)
+
+    def _idf(self, term):
+        plist = self.postings.get(term)
+        if not plist:
+            return 0.0
+        idf = self._raw_idf(len(plist))
+        if idf < 0:
+            # floor, as in BM25Okapi; the O(vocab) average is only needed here
+            if self._avg_idf is None:
+                self._avg_idf = sum(self._raw_idf(len(p)) for p in self.postings.values()) / len(self.postings)
+            idf = self.epsilon * self._avg_idf
+        return idf
+
+    def scores(self, query, docs=None):
+        # {doc_id: score} for documents sharing at least one query term,
+        # optionally restricted to the doc ids in `docs`
+        out = {}
+        if not self.doc_len:
+            return out
+        avgdl = self.total_len / len(self.doc_len)
+        k1, b = self.k1, self.b
+
+        for term in tokenize(query):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = self._idf(term)
+            if docs is not None:
+                plist = {d: plist[d] for d in docs if d in plist}
+            for doc_id, tf in plist.items():
+                norm = k1 * (1 - b + b * self.doc_len[doc_id] / avgdl)
+                out[doc_id] = out.get(doc_id, 0.0) + idf * (tf * (k1 + 1) / (tf + norm))
+        return out
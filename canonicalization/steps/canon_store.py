@@ -0,0 +1,66 @@
+import json, os, sqlite3
+import numpy as np
+
+# Persistent step6 state for incremental runs over the same KG:
+#   alias     (kind, pool, alias) -> canonical (canonicals map to themselves)
+#   canon_vec (kind, pool, canonical) -> unit float32 vector (retrieval anchors)
+# kind is "entity" / "relation"; pool is the entity type or the relation's
+# (head type, tail type) pair, JSON-encoded.
+
+def pool_id(key):
+    return json.dumps(list(key) if isinstance(key, tuple) else key, ensure_ascii=False)
+
+class CanonStore:
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS alias ("
+                "kind TEXT NOT NULL, pool TEXT NOT NULL, alias TEXT NOT NULL, canon TEXT NOT NULL, "
+                "PRIMARY KEY (kind, pool, alias)) WITHOUT ROWID"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS canon_vec ("
+                "kind TEXT NOT NULL, pool TEXT NOT NULL, canon TEXT NOT NULL, vec BLOB NOT NULL, "
+                "PRIMARY KEY (kind, pool, canon)) WITHOUT ROWID"
+            )
+
+    def load_pool(self, kind, key):
+        # (alias -> canonical, canonical texts, canonical matrix) for one pool
+        pool = pool_id(key)
+        aliases = dict(self.conn.execute(
+            "SELECT alias, canon FROM alias WHERE kind = ? AND pool = ?", (kind, pool)
+        ))
+        canons, vecs = [], []
+        for canon, vec in self.conn.execute(
+            "SELECT canon, vec FROM canon_vec WHERE kind = ? AND pool = ? ORDER BY canon", (kind, pool)
+        ):
+            canons.append(canon)
+            vecs.append(np.frombuffer(vec, dtype=np.float32))
+        mat = np.stack(vecs) if vecs else None
+        return aliases, canons, mat
+
+    def save_pool(self, kind, key, aliases, canon_vecs, repointed=None):
+        # repointed: stored canonical -> canonical it was merged into during this run
+        pool = pool_id(key)
+        with self.conn:
+            for old, new in (repointed or {}).items():
+                self.conn.execute(
+                    "UPDATE alias SET canon = ? WHERE kind = ? AND pool = ? AND canon = ?",
+                    (new, kind, pool, old),
+                )
+                self.conn.execute(
+                    "DELETE FROM canon_vec WHERE kind = ? AND pool = ? AND canon = ?", (kind, pool, old)
+                )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO alias (kind, pool, alias, canon) VALUES (?, ?, ?, ?)",
+                ((kind, pool, a, c) for a, c in aliases.items()),
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO canon_vec (kind, pool, canon, vec) VALUES (?, ?, ?, ?)",
+                ((kind, pool, c, np.asarray(v, dtype=np.float32).tobytes()) for c, v in canon_vecs.items()),
+            )
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,57 @@
+import hashlib, os, sqlite3
+import numpy as np
+
+# Cross-run embedding cache: (model, sha1(text)) -> float32 vector blob.
+# Shared by every dataset/run so recurring surface forms are encoded once.
+
+CHUNK = 500
+
+def text_key(text):
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+class EmbeddingCache:
+    def __init__(self, path, model_name):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.model_name = model_name
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS emb ("
+            "model TEXT NOT NULL, key BLOB NOT NULL, vec BLOB NOT NULL, "
+            "PRIMARY KEY (model, key)) WITHOUT ROWID"
+        )
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, texts):
+        keys = {text_key(t): t for t in texts}
+        key_list = list(keys)
+        found = {}
+
+        for i in range(0, len(key_list), CHUNK):
+            chunk = key_list[i:i + CHUNK]
+            marks = ",".join("?" * len(chunk))
+            cur = self.conn.execute(
+                f"SELECT key, vec FROM emb WHERE model = ? AND key IN ({marks})",
+                [self.model_name, *chunk],
+            )
+            for key, vec in cur:
+                found[keys[key]] = np.frombuffer(vec, dtype=np.float32)
+
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, texts, matrix):
+        matrix = np.asarray(matrix, dtype=np.float32)
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO emb (model, key, vec) VALUES (?, ?, ?)",
+                ((self.model_name, text_key(t), matrix[i].tobytes()) for i, t in enumerate(texts)),
+            )
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def close(self):
+        self.conn.close()
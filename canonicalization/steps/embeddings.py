@@ -0,0 +1,58 @@
+import json, os
+import numpy as np
+
+# step5 -> step6 sidecar: one vector per unique string (N x D .npy) plus a
+# JSON list of the strings in row order (<name>.vocab.json), one string per
+# line so out-of-core step6 can stream it.
+
+def vocab_path(emb_path):
+    base = emb_path[:-4] if emb_path.endswith(".npy") else emb_path
+    return base + ".vocab.json"
+
+def static_path(emb_path):
+    # optional static (model2vec) vectors in the same row order, used by step6
+    # for candidate retrieval while the main matrix re-ranks
+    base = emb_path[:-4] if emb_path.endswith(".npy") else emb_path
+    return base + ".static.npy"
+
+def save_embeddings(emb_path, texts, matrix, dtype="float32", static=None):
+    np.save(emb_path, np.asarray(matrix, dtype=dtype))
+    # a stale static sidecar would silently switch step6 to static search
+    if static is not None:
+        np.save(static_path(emb_path), np.asarray(static, dtype=dtype))
+    elif os.path.exists(static_path(emb_path)):
+        os.remove(static_path(emb_path))
+    with open(vocab_path(emb_path), "w", encoding="utf-8") as f:
+        f.write("[")
+        for i, t in enumerate(texts):
+            f.write(("\n" if i == 0 else ",\n") + json.dumps(t, ensure_ascii=False))
+        f.write("\n]\n")
+
+def iter_vocab(emb_path):
+    # the strings in row order, without holding the whole list
+    with open(vocab_path(emb_path), "r", encoding="utf-8") as f:
+        first = f.readline()
+        if first.strip() != "[":
+            # single-line list written by an older step5
+            yield from json.loads(first + f.read())
+            return
+        for line in f:
+            line = line.strip().rstrip(",")
+            if line and line != "]":
+                yield json.loads(line)
+
+def load_embeddings(emb_path, mmap=True):
+    vecs = np.load(emb_path, mmap_mode="r" if mmap else None)
+    return {t: i for i, t in enumerate(iter_vocab(emb_path))}, vecs
+
+def load_static(emb_path, mmap=True):
+    path = static_path(emb_path)
+    if not os.path.exists(path):
+        return None
+    return np.load(path, mmap_mode="r" if mmap else None)
+
+def normalize_rows(matrix):
+    # float32 unit rows, so cosine similarity is a dot product
+    m = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    return m / np.maximum(norms, 1e-12)
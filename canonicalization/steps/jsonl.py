@@ -0,0 +1,24 @@
+import json
+
+# Record streams between steps: every stepN(input_path, output_path) is a thin
+# file wrapper around a generator over these records, so run.py can also chain
+# the generators directly (--in-memory) and only tee them to disk on request.
+
+def read_jsonl(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+def write_jsonl(path, records):
+    with open(path, "w", encoding="utf-8") as f:
+        for rec in records:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+def tee_jsonl(records, path):
+    # pass records through unchanged, writing each one to path on the way
+    with open(path, "w", encoding="utf-8") as f:
+        for rec in records:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            yield rec
@@ -0,0 +1,36 @@
+import numpy as np
+from steps.embeddings import normalize_rows
+
+# CPU entity typer for step3: one centroid per label, built from the label
+# description and the few-shot entities of that label. An entity is labeled
+# locally only when its best centroid beats the runner-up by `margin`;
+# everything else still goes to the LLM.
+
+class LocalTyper:
+    def __init__(self, ont, examples, encode, margin=0.1):
+        # ont: {label: description}; examples: [(entity, label)]; encode: texts -> matrix
+        self.encode = encode
+        self.margin = margin
+        self.labels = [k for k in ont if k != "Unknown"]
+
+        protos = {k: [f"{k}: {ont[k]}"] for k in self.labels}
+        for entity, label in examples:
+            if label in protos:
+                protos[label].append(entity)
+
+        texts = [t for k in self.labels for t in protos[k]]
+        vecs = normalize_rows(encode(texts))
+        owner = np.repeat(np.arange(len(self.labels)), [len(protos[k]) for k in self.labels])
+        cent = np.stack([vecs[owner == i].mean(axis=0) for i in range(len(self.labels))])
+        self.centroids = normalize_rows(cent)
+
+    def predict(self, entities):
+        # {entity: label} for the entities that clear the margin
+        entities = list(dict.fromkeys(entities))
+        if not entities or len(self.labels) < 2:
+            return {}
+        sims = normalize_rows(self.encode(entities)) @ self.centroids.T
+        top2 = np.sort(sims, axis=1)[:, -2:]
+        best = sims.argmax(axis=1)
+        sure = top2[:, 1] - top2[:, 0] >= self.margin
+        return {e: self.labels[b] for e, b, ok in zip(entities, best.tolist(), sure.tolist()) if ok}
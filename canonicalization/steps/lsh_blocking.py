@@ -0,0 +1,53 @@
+import zlib
+import numpy as np
+
+# Character-shingle MinHash LSH blocking for step6 pools.
+# Each text gets bands * rows MinHash values over its padded character
+# shingles; two texts share a block when any band of rows values matches.
+# More bands / fewer rows -> higher candidate recall, larger blocks.
+
+PRIME = (1 << 31) - 1
+SHINGLE = 3
+
+def shingles(text, n=SHINGLE):
+    s = f" {text.lower()} "
+    return {s[i:i + n] for i in range(max(1, len(s) - n + 1))}
+
+class LSHBlocker:
+    def __init__(self, texts, bands=32, rows=2, seed=0):
+        self.bands = bands
+        self.rows = rows
+        rng = np.random.default_rng(seed)
+        n = bands * rows
+        self.a = rng.integers(1, PRIME, n, dtype=np.uint64)
+        self.b = rng.integers(0, PRIME, n, dtype=np.uint64)
+
+        self.buckets = {}  # (band, key bytes) -> set of ids
+        self.keys = {}     # id -> its bucket keys (for removal)
+        for i, text in enumerate(texts):
+            self.add(i, text)
+
+    def signature(self, text):
+        h = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles(text)), dtype=np.uint64)
+        return ((self.a[:, None] * h[None, :] + self.b[:, None]) % PRIME).min(axis=1)
+
+    def add(self, i, text):
+        sig = self.signature(text)
+        keys = [(band, sig[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+        for key in keys:
+            self.buckets.setdefault(key, set()).add(i)
+        self.keys[i] = keys
+
+    def remove(self, i):
+        for key in self.keys.pop(i, ()):
+            bucket = self.buckets[key]
+            bucket.discard(i)
+            if not bucket:
+                del self.buckets[key]
+
+    def block(self, i):
+        # live ids sharing at least one band with i (i included)
+        out = set()
+        for key in self.keys.get(i, ()):
+            out |= self.buckets[key]
+        return out
@@ -0,0 +1,115 @@
+import json, os, sqlite3
+from steps.embeddings import iter_vocab
+
+# On-disk string tables for out-of-core step6 (--step6_out_of_core):
+#   vocab (text -> row of the memory-mapped step5 matrix)
+#   item  (pool, text) in first-appearance order; each entity type / relation
+#         type pair is one partition, loaded one at a time
+#   cluster / premerged / known: each pool's decisions, recorded pool by pool
+#         with the same "first position, last value" order as the in-memory
+#         dicts, then folded into
+#   alias (kind, text) -> canonical, applied to the rows in a streaming pass
+
+class PartitionStore:
+    def __init__(self, path, emb_path):
+        self.path = path
+        if os.path.exists(path):
+            os.remove(path)
+        self.conn = sqlite3.connect(path)
+        # scratch data, rebuilt on every run
+        self.conn.execute("PRAGMA journal_mode = OFF")
+        self.conn.execute("PRAGMA synchronous = OFF")
+        with self.conn:
+            self.conn.execute("CREATE TABLE vocab (text TEXT PRIMARY KEY, row INTEGER NOT NULL) WITHOUT ROWID")
+            self.conn.execute(
+                "CREATE TABLE item (seq INTEGER PRIMARY KEY, pool INTEGER NOT NULL, text TEXT NOT NULL, "
+                "UNIQUE (pool, text))"
+            )
+            for table, col in (("cluster", "canon"), ("premerged", "alias"), ("known", "alias")):
+                self.conn.execute(
+                    f"CREATE TABLE {table} (kind TEXT NOT NULL, {col} TEXT NOT NULL, seq INTEGER NOT NULL, "
+                    f"value TEXT NOT NULL, PRIMARY KEY (kind, {col})) WITHOUT ROWID"
+                )
+            self.conn.execute(
+                "CREATE TABLE alias (kind TEXT NOT NULL, text TEXT NOT NULL, canon TEXT NOT NULL, "
+                "PRIMARY KEY (kind, text)) WITHOUT ROWID"
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO vocab (text, row) VALUES (?, ?)",
+                ((t, i) for i, t in enumerate(iter_vocab(emb_path))),
+            )
+        self.pools = {}  # (kind, key) -> pool id, in first-appearance order
+        self.seq = 0
+
+    def pool(self, kind, key):
+        return self.pools.setdefault((kind, key), len(self.pools))
+
+    def add_rows(self, rows):
+        def items():
+            for row in rows:
+                h, t = row["head"], row["tail"]
+                yield self.pool("entity", h["type"]), h["text"]
+                yield self.pool("entity", t["type"]), t["text"]
+                yield self.pool("relation", (h["type"], t["type"])), row["relation"]
+
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO item (pool, text) VALUES (?, ?)", items())
+
+    def partitions(self):
+        # (pool id, kind, key): entity pools first, as in the in-memory step6
+        ordered = sorted(self.pools.items(), key=lambda kv: (kv[0][0] != "entity", kv[1]))
+        return [(pid, kind, key) for (kind, key), pid in ordered]
+
+    def load(self, pid):
+        # {text: matrix row} for one partition, in first-appearance order
+        return dict(self.conn.execute(
+            "SELECT item.text, vocab.row FROM item JOIN vocab ON vocab.text = item.text "
+            "WHERE item.pool = ? ORDER BY item.seq", (pid,)
+        ))
+
+    def get(self, text, default=None):
+        # matrix row of any string step5 embedded (dict-style, like the in-memory vocab)
+        hit = self.conn.execute("SELECT row FROM vocab WHERE text = ?", (text,)).fetchone()
+        return hit[0] if hit else default
+
+    def _record(self, table, col, kind, items):
+        def rows():
+            for k, v in items:
+                self.seq += 1
+                yield kind, k, self.seq, v
+
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT INTO {table} (kind, {col}, seq, value) VALUES (?, ?, ?, ?) "
+                f"ON CONFLICT (kind, {col}) DO UPDATE SET value = excluded.value",
+                rows(),
+            )
+
+    def add_pool(self, kind, clusters, premerged, known):
+        # one pool's cluster map, pre-merged aliases and store-known aliases
+        self._record("cluster", "canon", kind, ((c, json.dumps(sorted(m), ensure_ascii=False)) for c, m in clusters.items()))
+        self._record("premerged", "alias", kind, premerged.items())
+        self._record("known", "alias", kind, known.items())
+
+    def build_aliases(self):
+        # same fold as the in-memory step6: cluster members -> canonical, then
+        # pre-merged aliases follow their representative, then stored decisions
+        # follow their canonical
+        def put(kind, text, canon):
+            self.conn.execute("INSERT OR REPLACE INTO alias (kind, text, canon) VALUES (?, ?, ?)", (kind, text, canon))
+
+        with self.conn:
+            for kind, canon, members in self.conn.execute("SELECT kind, canon, value FROM cluster ORDER BY seq"):
+                for m in json.loads(members):
+                    put(kind, m, canon)
+            for table in ("premerged", "known"):
+                for kind, alias, target in self.conn.execute(f"SELECT kind, alias, value FROM {table} ORDER BY seq"):
+                    put(kind, alias, self.canonical(kind, target))
+
+    def canonical(self, kind, text):
+        hit = self.conn.execute("SELECT canon FROM alias WHERE kind = ? AND text = ?", (kind, text)).fetchone()
+        return hit[0] if hit else text
+
+    def close(self):
+        self.conn.close()
+        os.remove(self.path)
@@ -0,0 +1,74 @@
+import multiprocessing as mp
+import threading
+import traceback
+
+# Worker processes for step6 pool retrieval (BM25 + ANN are CPU-bound).
+# Each pool is pinned to one worker (pool_id % n), which keeps its PoolState
+# between rounds. Workers memory-map the step5 embedding matrix themselves.
+
+def pool_worker(conn, emb_path, lsh=None, min_sim=None):
+    import numpy as np
+    from steps.embeddings import load_static
+    from steps.step6_canonicalize import MIN_SIM, pool_state, select_round, apply_round
+
+    vecs = np.load(emb_path, mmap_mode="r")
+    static = load_static(emb_path)
+    min_sim = MIN_SIM if min_sim is None else min_sim
+    states = {}
+
+    while True:
+        msg = conn.recv()
+        if msg is None:
+            break
+        pool_id, (op, *args) = msg
+        try:
+            if op == "init":
+                states[pool_id] = pool_state(vecs, *args, static=static, lsh=lsh, min_sim=min_sim)
+                out = None
+            elif op == "round":
+                out = select_round(states[pool_id], args[0])
+            elif op == "apply":
+                groups, replies, round_size = args
+                state = states[pool_id]
+                clusters = {}
+                apply_round(state, groups, replies, clusters)
+                groups = select_round(state, round_size) if state.remaining else []
+                if not groups:
+                    del states[pool_id]
+                out = (clusters, groups)
+            else:
+                raise ValueError(f"unknown op: {op}")
+        except Exception as e:
+            out = RuntimeError(f"pool worker failed on {op}: {e}\n{traceback.format_exc()}")
+        conn.send(out)
+
+class PoolWorkers:
+    def __init__(self, n, emb_path, lsh=None, min_sim=None):
+        ctx = mp.get_context("spawn")
+        self.conns, self.procs, self.locks = [], [], []
+        for _ in range(n):
+            parent, child = ctx.Pipe()
+            p = ctx.Process(target=pool_worker, args=(child, emb_path, lsh, min_sim), daemon=True)
+            p.start()
+            self.conns.append(parent)
+            self.procs.append(p)
+            self.locks.append(threading.Lock())
+
+    def call(self, pool_id, msg):
+        # blocking round-trip; run from a thread so the event loop keeps serving LLM calls
+        w = pool_id % len(self.conns)
+        with self.locks[w]:
+            self.conns[w].send((pool_id, msg))
+            out = self.conns[w].recv()
+        if isinstance(out, Exception):
+            raise out
+        return out
+
+    def close(self):
+        for conn in self.conns:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for p in self.procs:
+            p.join(timeout=5)
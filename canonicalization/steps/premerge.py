@@ -0,0 +1,81 @@
+import re, unicodedata
+from collections import defaultdict
+
+# Rule-based pre-merge for step6: surface forms that only differ in case,
+# punctuation, accents, a leading article, plural/singular (entities) or
+# auxiliaries/tense (relations) share a normalization key and are merged
+# before any LLM call. Only one representative per key enters the LLM pass.
+
+ARTICLES = {"the", "a", "an"}
+# tense-only auxiliaries are dropped; forms of "have" are kept (as "have"),
+# since "has owner" and "is owner" point in opposite directions, unless a
+# form of "be" follows ("had been" is tense, not possession)
+BE_FORMS = {"is", "are", "was", "were", "be", "been", "being", "am"}
+AUXILIARIES = BE_FORMS | {"do", "does", "did"}
+POSSESSIVES = {"has", "have", "had", "having"}
+
+def norm_tokens(text):
+    text = unicodedata.normalize("NFKD", text).casefold()
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    # signed/decimal numbers stay whole so "+2" and "2" never share a key;
+    # symbols that name things stay too ("C++" / "C#" / "C", "AT&T" / "AT T")
+    return re.findall(r"[+-]?\d+(?:[.,]\d+)*|[^\W_]+[+#]*|[+#&%$@]", text)
+
+def singular(tok):
+    if len(tok) > 4 and tok.endswith("ies"):
+        return tok[:-3] + "y"
+    if len(tok) > 4 and tok.endswith(("ches", "shes", "sses", "xes", "zes")):
+        return tok[:-2]
+    if len(tok) > 3 and tok.endswith("s") and not tok.endswith(("ss", "us", "is")):
+        return tok[:-1]
+    return tok
+
+def verb_stem(tok):
+    # conservative inflection strip: plays/playing -> play, locates -> locat.
+    # "-ed" stays: it marks the passive ("owned" vs "owns") and its bare form
+    # may be a noun ("ordered" vs "order")
+    for suf in ("ing", "es", "s"):
+        if tok.endswith(suf) and len(tok) - len(suf) >= 3:
+            if suf == "s" and tok.endswith(("ss", "us", "is")):
+                break
+            tok = tok[:-len(suf)]
+            break
+    if len(tok) > 3 and tok.endswith("e"):
+        tok = tok[:-1]
+    if len(tok) > 3 and tok[-1] == tok[-2] and tok[-1] not in "aeiouls":
+        tok = tok[:-1]
+    return tok
+
+def entity_key(text):
+    toks = norm_tokens(text)
+    if len(toks) > 1 and toks[0] in ARTICLES:
+        toks = toks[1:]
+    # only common nouns are singularized; "Charles" must not become "Charle"
+    words = text.split()
+    if toks and toks[-1].isalpha() and words and words[-1].islower():
+        toks[-1] = singular(toks[-1])
+    return " ".join(toks)
+
+def relation_key(text):
+    toks = [t for t in norm_tokens(text) if t not in ARTICLES]
+    out = []
+    for i, t in enumerate(toks):
+        if t in AUXILIARIES:
+            continue
+        if t in POSSESSIVES:
+            if i + 1 < len(toks) and toks[i + 1] in BE_FORMS:
+                continue
+            out.append("have")
+        else:
+            out.append(verb_stem(t))
+    return " ".join(out)
+
+def premerge(texts, key_fn):
+    # {representative: [members incl. representative]} for keys shared by 2+ texts;
+    # the first text (pool order) represents its group
+    by_key = defaultdict(list)
+    for t in texts:
+        key = key_fn(t)
+        if key:
+            by_key[key].append(t)
+    return {members[0]: members for members in by_key.values() if len(members) > 1}
@@ -0,0 +1,100 @@
+import hashlib, json, os, re
+
+# make-style step skipping for run.py. Every step output gets a
+# <output>.stamp.json holding a hash of the step's input files, code and
+# parameters; a step whose stamp still matches (and whose outputs are intact)
+# is skipped, so a re-run resumes at the first step whose inputs changed.
+
+STEPS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(os.path.dirname(STEPS_DIR))
+# steps.X, plus the construction.* modules shared with the construction
+# pipeline (steps/triple_io.py re-exports construction/utils/triple_io.py)
+IMPORT_RE = re.compile(r"^\s*from (?:steps\.(\w+)|(construction(?:\.\w+)+)) import", re.M)
+
+def stamp_path(path):
+    return path + ".stamp.json"
+
+def sha1_file(path, chunk=1 << 20):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        while True:
+            b = f.read(chunk)
+            if not b:
+                break
+            h.update(b)
+    return h.hexdigest()
+
+def file_info(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+def file_digest(path):
+    # content hash, reused from the producing step's stamp while size/mtime match
+    # (the step5 sidecars are stamped together with their .npy)
+    owners = [path] + [path[:-len(suf)] + ".npy" for suf in (".vocab.json", ".static.npy") if path.endswith(suf)]
+    for owner in owners:
+        sp = stamp_path(owner)
+        if not os.path.exists(sp):
+            continue
+        with open(sp, "r", encoding="utf-8") as f:
+            rec = json.load(f)["outputs"].get(path)
+        if rec and {k: rec[k] for k in ("size", "mtime_ns")} == file_info(path):
+            return rec["sha1"]
+    return sha1_file(path)
+
+def module_path(name):
+    # "step1_dedup" -> steps/step1_dedup.py, "construction.utils.x" -> construction/utils/x.py
+    if name.startswith("construction."):
+        return os.path.join(ROOT_DIR, *name.split(".")) + ".py"
+    return os.path.join(STEPS_DIR, f"{name}.py")
+
+def code_digest(module):
+    # the step module plus every steps.* / construction.* module it imports, transitively
+    h = hashlib.sha1()
+    seen, todo = {}, [module]
+    while todo:
+        name = todo.pop()
+        if name in seen:
+            continue
+        with open(module_path(name), "rb") as f:
+            seen[name] = f.read()
+        todo += [step or shared for step, shared in IMPORT_RE.findall(seen[name].decode("utf-8"))]
+    for name in sorted(seen):
+        h.update(name.encode() + b"\0" + seen[name])
+    return h.hexdigest()
+
+def step_key(inputs, module, params):
+    payload = {
+        "inputs": {p: file_digest(p) for p in inputs},
+        "code": code_digest(module),
+        "params": params,
+    }
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+def run_step(name, fn, inputs, outputs, module, params, resume=True):
+    # fn() writes outputs; skipped when the stamp on outputs[0] is still valid.
+    # Returns whether the step ran.
+    sp = stamp_path(outputs[0])
+    key = step_key(inputs, module, params) if resume else None
+
+    if resume and os.path.exists(sp) and all(os.path.exists(p) for p in outputs):
+        with open(sp, "r", encoding="utf-8") as f:
+            stamp = json.load(f)
+        intact = all(
+            {k: stamp["outputs"].get(p, {}).get(k) for k in ("size", "mtime_ns")} == file_info(p)
+            for p in outputs
+        )
+        if stamp.get("key") == key and intact:
+            print(f"[{name} SKIPPED] up to date")
+            return False
+
+    # a crash leaves no stamp behind, so a partial output is never trusted
+    if os.path.exists(sp):
+        os.remove(sp)
+    fn()
+    if resume:
+        stamp = {"key": key, "outputs": {p: {**file_info(p), "sha1": sha1_file(p)} for p in outputs}}
+        with open(sp, "w", encoding="utf-8") as f:
+            json.dump(stamp, f, indent=1)
+    print(f"[{name} DONE]")
+    return True
@@ -1,37 +1,13 @@
-import ast
+from steps.triple_io import iter_rows, write_rows
+from steps.triple_store import TripleDedup
 
-def step1(input_path, output_path):
-    canonical = {}
-    output_lines = []
-
-    with open(input_path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-
-            row = ast.literal_eval(line)
-            if not row:
-                output_lines.append([])
-                continue
-
-            row_seen = set()
-            new_row = []
-
-            for s, p, o in row:
-                key = (s.lower(), p.lower(), o.lower())
+def dedup_rows(rows):
+    # rows stream through one at a time; only the interned strings and the
+    # first-casing index (one int per distinct folded triple) are kept
+    dedup = TripleDedup()
 
-                if key in row_seen:
-                    continue
-                row_seen.add(key)
+    for row in rows:
+        yield dedup.dedup_row(row)
 
-                if key not in canonical:
-                    canonical[key] = [s, p, o]
-
-                new_row.append(canonical[key])
-
-            output_lines.append(new_row)
-
-    with open(output_path, "w", encoding="utf-8") as f:
-        for row in output_lines:
-            f.write(f"{row}\n")
+def step1(input_path, output_path):
+    write_rows(output_path, dedup_rows(iter_rows(input_path)))
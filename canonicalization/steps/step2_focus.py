@@ -1,30 +1,22 @@
-import ast, json
+from steps.triple_io import iter_rows
+from steps.jsonl import write_jsonl
 
-def step2(input_path, output_path):
+def focus_records(rows):
+    # one structured record per triple; step3 types both the HEAD and the TAIL
+    # focus and renders the tagged prompt text itself
     idx = 1
 
-    with open(input_path, "r", encoding="utf-8") as fin, \
-         open(output_path, "w", encoding="utf-8") as fout:
-
-        for row_id, line in enumerate(fin):
-            line = line.strip()
-            if not line:
-                continue
-
-            rows = ast.literal_eval(line)
-            for h, r, t in rows:
-                base_id = f"triple_{idx:06d}"
+    for row_id, triples in enumerate(rows):
+        for h, r, t in triples:
+            yield {
+                "row_id": row_id,
+                "triple_id": f"triple_{idx:06d}",
+                "h": h,
+                "r": r,
+                "t": t
+            }
 
-                fout.write(json.dumps({
-                    "row_id": row_id,
-                    "id": f"{base_id}_H",
-                    "text": f"[HEAD] {h} [/HEAD] [REL] {r} [/REL] [TAIL] {t} [/TAIL] [FOCUS] HEAD [/FOCUS]"
-                }, ensure_ascii=False) + "\n")
+            idx += 1
 
-                fout.write(json.dumps({
-                    "row_id": row_id,
-                    "id": f"{base_id}_T",
-                    "text": f"[HEAD] {h} [/HEAD] [REL] {r} [/REL] [TAIL] {t} [/TAIL] [FOCUS] TAIL [/FOCUS]"
-                }, ensure_ascii=False) + "\n")
-
-                idx += 1
+def step2(input_path, output_path):
+    write_jsonl(output_path, focus_records(iter_rows(input_path)))
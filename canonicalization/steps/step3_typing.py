@@ -1,12 +1,63 @@
-import json
+import json, re, threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
 from steps.utils import MODEL_MAP, get_client
-
-MAX_INPUT_TOKENS = 1400
-BASE_PROMPT_TOKENS = 750
+from steps.token_count import TokenCounter
+from steps.step_stats import add_counts, add_usage
+from steps.jsonl import read_jsonl, write_jsonl
+
+# item block (user message) per request; the fixed prefix below is sent with
+# every request on top of it
+MAX_ITEM_TOKENS = 650
+# chat-format overhead: role/separator tokens per message, plus the primed reply
+MESSAGE_TOKENS = 3
+REPLY_TOKENS = 3
 MAX_BATCH_SIZE = 16
 MIN_BATCH_SIZE = 1
 
-def step3(input_path, output_path, prompt_dir, model_key, api_base=None):
+# label cache granularity: "text" = the whole tagged triple (context-sensitive),
+# "entity" = focused entity + focus side, "entity+rel" = also the relation
+CACHE_KEYS = ("text", "entity", "entity+rel")
+TAG_RE = re.compile(r"\[(HEAD|REL|TAIL|FOCUS)\] (.*?) \[/\1\]")
+
+FOCUS_SIDES = (("HEAD", "h", "head_type"), ("TAIL", "t", "tail_type"))
+
+def focus_entity(text):
+    # (focus side, focused entity, relation) of a tagged few-shot text, or None
+    tags = dict(TAG_RE.findall(text))
+    focus = tags.get("FOCUS")
+    if focus not in ("HEAD", "TAIL"):
+        return None
+    return focus, tags.get(focus, ""), tags.get("REL", "")
+
+def render(rec, focus):
+    # tagged text is only built for the prompt; records stay structured
+    return (f"[HEAD] {rec['h']} [/HEAD] [REL] {rec['r']} [/REL] "
+            f"[TAIL] {rec['t']} [/TAIL] [FOCUS] {focus} [/FOCUS]")
+
+def cache_key(rec, focus, field, mode="entity"):
+    if mode == "text":
+        return render(rec, focus)
+    if mode == "entity+rel":
+        return focus, rec[field], rec["r"]
+    return focus, rec[field]
+
+def local_labels(records, ont, fewshot, margin):
+    # pre-pass: type every distinct focused entity with the local centroid typer
+    from sentence_transformers import SentenceTransformer
+    from steps.step5_embed import EMBED_MODEL, encode_texts
+    from steps.local_typer import LocalTyper
+
+    model = SentenceTransformer(EMBED_MODEL, device="cpu")
+    encode = lambda texts: encode_texts(model, texts)
+
+    examples = [(parts[1], ex["label"]) for ex in fewshot if (parts := focus_entity(ex["text"]))]
+    typer = LocalTyper(ont, examples, encode, margin)
+
+    entities = [e for rec in records for e in (rec["h"], rec["t"])]
+    return typer.predict(entities)
+
+def type_records(records, prompt_dir, model_key, api_base=None, concurrency=1, cache_mode="entity", local_margin=None):
     client = get_client(api_base)
     MODEL_NAME = MODEL_MAP[model_key]
 
@@ -20,6 +71,7 @@ def step3(input_path, output_path, prompt_dir, model_key, api_base=None):
         [f"{i+1}. {k}: {v}" for i, (k, v) in enumerate(ont.items())]
     )
 
+    fewshot = []
     fewshot_msgs = []
     with open(FEWSHOT_PATH, "r", encoding="utf-8") as f:
         for line in f:
@@ -31,6 +83,7 @@ def step3(input_path, output_path, prompt_dir, model_key, api_base=None):
             except json.JSONDecodeError:
                 continue
 
+            fewshot.append(ex)
             fewshot_msgs.append({"role": "user", "content": ex["text"]})
             fewshot_msgs.append({
                 "role": "assistant",
@@ -63,13 +116,20 @@ Rules:
 - One label per item
 """.strip()
 
-    def estimate_tokens(text: str) -> int:
-        return max(1, len(text) // 4)
-
-    def flush_batch(batch_items):
-        if not batch_items:
-            return {}
+    count_tokens = TokenCounter(MODEL_NAME)
+    # fixed prefix of every request (system prompt with the label block, the
+    # few-shot pairs, the user message wrapper), counted once for the log
+    base_tokens = (
+        count_tokens(SYSTEM_PROMPT)
+        + sum(count_tokens(m["content"]) for m in fewshot_msgs)
+        + MESSAGE_TOKENS * (len(fewshot_msgs) + 2)
+        + REPLY_TOKENS
+    )
+    stats = {"items": 0, "hits": 0, "local": 0, "sent": 0, "calls": 0}
+    stats_lock = threading.Lock()
 
+    def ask_batch(batch_items):
+        # {id: label} for the items the reply covers; None if the reply is unusable
         user_block = "\n".join(
             [f'{it["id"]}. {it["text"]}' for it in batch_items]
         )
@@ -80,87 +140,164 @@ Rules:
             + [{"role": "user", "content": user_block}]
         )
 
+        with stats_lock:
+            stats["calls"] += 1
+        add_counts(ncll=1)
+
         try:
             resp = client.chat.completions.create(
                 model=MODEL_NAME,
                 temperature=0.0,
                 messages=messages
             )
+            add_usage(resp)
             content = resp.choices[0].message.content
             results = json.loads(content)
         except Exception:
-            return {it["id"]: "Unknown" for it in batch_items}
+            return None
+
+        if not isinstance(results, list):
+            return None
 
         out = {}
         for r in results:
             if isinstance(r, dict) and "id" in r and "label" in r:
-                out[r["id"]] = r["label"]
-
-        for it in batch_items:
-            out.setdefault(it["id"], "Unknown")
-
+                try:
+                    out[int(r["id"])] = r["label"]
+                except (TypeError, ValueError):
+                    continue
         return out
 
-    cache = {}
-    batch = []
-    batch_meta = []
-    current_tokens = BASE_PROMPT_TOKENS
-    next_id = 1
+    def flush_batch(batch_items):
+        # a failed reply is bisected and retried; only a single item that
+        # still fails is labeled "Unknown"
+        if not batch_items:
+            return {}
 
-    with open(input_path, "r", encoding="utf-8") as fin, \
-         open(output_path, "w", encoding="utf-8") as fout:
+        out = ask_batch(batch_items) or {}
+        missing = [it for it in batch_items if it["id"] not in out]
+        if missing:
+            if len(batch_items) == 1:
+                out[batch_items[0]["id"]] = "Unknown"
+            elif len(missing) < len(batch_items):
+                out.update(flush_batch(missing))
+            else:
+                mid = len(batch_items) // 2
+                out.update(flush_batch(batch_items[:mid]))
+                out.update(flush_batch(batch_items[mid:]))
+        return out
 
-        for line in fin:
-            line = line.strip()
-            if not line:
-                continue
+    def type_batch(batch_items, keys):
+        labels = flush_batch(batch_items)
+        return {k: labels.get(it["id"], "Unknown") for it, k in zip(batch_items, keys)}
 
-            try:
-                item = json.loads(line)
-            except json.JSONDecodeError:
-                continue
+    # entities the local typer is confident about never reach the LLM;
+    # this pre-pass needs every record, so the stream is materialized for it
+    local = {}
+    if local_margin is not None:
+        records = list(records)
+        local = local_labels(records, ont, fewshot, local_margin)
 
-            key = item["text"]
+    # cache: key -> label, or the Future of the in-flight batch typing that key.
+    # Records wait in input order and are written once both sides are typed.
 
-            if key in cache:
-                item["label"] = cache[key]
-                fout.write(json.dumps(item, ensure_ascii=False) + "\n")
-                continue
+    cache = {}
+    pending = deque()
+    inflight = []
+    batch = []
+    batch_keys = []
+    current_tokens = 0
+    next_id = 1
 
-            item_text = item["text"]
-            item_tokens = estimate_tokens(item_text)
-
-            if (
-                batch and
-                (
-                    current_tokens + item_tokens > MAX_INPUT_TOKENS
-                    or len(batch) >= MAX_BATCH_SIZE
-                )
-            ):
-                labels = flush_batch(batch)
-
-                for orig_item, k, i_id in batch_meta:
-                    label = labels.get(i_id, "Unknown")
-                    cache[k] = label
-                    orig_item["label"] = label
-                    fout.write(json.dumps(orig_item, ensure_ascii=False) + "\n")
-
-                batch = []
-                batch_meta = []
-                current_tokens = BASE_PROMPT_TOKENS
-
-            batch.append({
-                "id": next_id,
-                "text": item_text
-            })
-            batch_meta.append((item, key, next_id))
-            current_tokens += item_tokens
-            next_id += 1
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+
+        def resolve(key, block):
+            label = cache[key]
+            if isinstance(label, Future):
+                if not (block or label.done()):
+                    return None
+                cache.update(label.result())
+                label = cache[key]
+            return label
+
+        def drain(block):
+            while pending:
+                rec, keys = pending[0]
+                labels = [resolve(k, block) for k in keys]
+                if None in labels:
+                    break
+                for (_, _, type_field), label in zip(FOCUS_SIDES, labels):
+                    rec[type_field] = label
+                yield rec
+                pending.popleft()
+
+        def dispatch():
+            fut = executor.submit(type_batch, batch, batch_keys)
+            for k in batch_keys:
+                cache[k] = fut
+            inflight.append(fut)
+            # keep at most `concurrency` batches in flight
+            if len(inflight) >= concurrency:
+                wait(inflight, return_when=FIRST_COMPLETED)
+            inflight[:] = [f for f in inflight if not f.done()]
+
+        for rec in records:
+            keys = []
+            for focus, field, _ in FOCUS_SIDES:
+                key = cache_key(rec, focus, field, cache_mode)
+                keys.append(key)
+                stats["items"] += 1
+
+                if key in cache:
+                    stats["hits"] += 1
+                    continue
+
+                if rec[field] in local:
+                    stats["local"] += 1
+                    cache[key] = local[rec[field]]
+                    continue
+
+                item_text = render(rec, focus)
+                # the prompt line is "{id}. {text}", joined with newlines
+                item_tokens = count_tokens(f"{next_id}. ") + count_tokens(item_text) + 1
+
+                if (
+                    batch and
+                    (
+                        current_tokens + item_tokens > MAX_ITEM_TOKENS
+                        or len(batch) >= MAX_BATCH_SIZE
+                    )
+                ):
+                    dispatch()
+                    yield from drain(False)
+                    batch = []
+                    batch_keys = []
+                    current_tokens = 0
+
+                batch.append({
+                    "id": next_id,
+                    "text": item_text
+                })
+                batch_keys.append(key)
+                cache[key] = None  # claimed by the batch being built
+                current_tokens += item_tokens
+                next_id += 1
+                stats["sent"] += 1
+
+            pending.append((rec, keys))
+            yield from drain(False)
 
         if batch:
-            labels = flush_batch(batch)
-            for orig_item, k, i_id in batch_meta:
-                label = labels.get(i_id, "Unknown")
-                cache[k] = label
-                orig_item["label"] = label
-                fout.write(json.dumps(orig_item, ensure_ascii=False) + "\n")
+            dispatch()
+        yield from drain(True)
+
+    hit_rate = stats["hits"] / stats["items"] if stats["items"] else 0.0
+    print(f"[STEP3] cache ({cache_mode}): {stats['hits']}/{stats['items']} hits ({hit_rate:.1%}), "
+          f"{stats['local']} typed locally, {stats['sent']} typed in {stats['calls']} LLM calls "
+          f"({base_tokens} prompt prefix + up to {MAX_ITEM_TOKENS} item tokens each)")
+    add_counts(nlkp=stats["items"], nhit=stats["hits"])
+
+def step3(input_path, output_path, prompt_dir, model_key, api_base=None, concurrency=1, cache_mode="entity", local_margin=None):
+    write_jsonl(output_path, type_records(
+        read_jsonl(input_path), prompt_dir, model_key, api_base, concurrency, cache_mode, local_margin
+    ))
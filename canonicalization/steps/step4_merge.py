@@ -1,40 +1,15 @@
-import json, re
-from collections import defaultdict
+from steps.jsonl import read_jsonl, write_jsonl
+
+def merge_records(records):
+    # step3 records carry h/r/t and both types; reshape them into step5/6 rows
+    for rec in records:
+        yield {
+            "row_id": rec["row_id"],
+            "triple_id": rec["triple_id"],
+            "relation": rec["r"],
+            "head": {"text": rec["h"], "type": rec["head_type"]},
+            "tail": {"text": rec["t"], "type": rec["tail_type"]}
+        }
 
 def step4(input_path, output_path):
-    def parse_text(text):
-        h = re.search(r"\[HEAD\](.*?)\[/HEAD\]", text).group(1).strip()
-        r = re.search(r"\[REL\](.*?)\[/REL\]", text).group(1).strip()
-        t = re.search(r"\[TAIL\](.*?)\[/TAIL\]", text).group(1).strip()
-        return h, r, t
-
-    groups = defaultdict(dict)
-
-    with open(input_path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-
-            item = json.loads(line)
-            row_id = item["row_id"]
-            base_id = item["id"].rsplit("_", 1)[0]
-            focus = item["id"].split("_")[-1]
-
-            h, r, t = parse_text(item["text"])
-
-            g = groups[(row_id, base_id)]
-            g["row_id"] = row_id
-            g["triple_id"] = base_id
-            g["relation"] = r
-
-            if focus == "H":
-                g["head"] = {"text": h, "type": item["label"]}
-                g.setdefault("tail", {"text": t})
-            else:
-                g["tail"] = {"text": t, "type": item["label"]}
-                g.setdefault("head", {"text": h})
-
-    with open(output_path, "w", encoding="utf-8") as f:
-        for g in groups.values():
-            f.write(json.dumps(g, ensure_ascii=False) + "\n")
+    write_jsonl(output_path, merge_records(read_jsonl(input_path)))
@@ -1,35 +1,130 @@
-import json
+import numpy as np
 from sentence_transformers import SentenceTransformer
+from steps.embeddings import save_embeddings
+from steps.emb_cache import EmbeddingCache
+from steps.step_stats import add_counts
+from steps.jsonl import read_jsonl
 
-def step5(input_path, output_path):
-    model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2", device="cpu") #Disable CPU as the default.
+EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+STATIC_MODEL = "minishlab/potion-base-8M"
+BATCH_SIZE = 256
 
-    entity_cache = {}
-    relation_cache = {}
+# transformer: MiniLM vectors only; static: model2vec vectors only (a table
+# lookup, no forward pass); hybrid: both, step6 searches the static space and
+# re-ranks with MiniLM
+EMBED_MODES = ("transformer", "static", "hybrid")
 
-    def get_embedding(text, cache):
-        if text in cache:
-            return cache[text]
-        emb = model.encode(text, convert_to_numpy=True).tolist()
-        cache[text] = emb
-        return emb
+# CPU backends for the encoder. ONNX / OpenVINO load the exports shipped in the
+# model repo; `quantize` picks the dynamically int8-quantized variant.
+BACKENDS = ("torch", "onnx", "openvino")
+# the AVX2 export has unsigned int8 weights (model_quint8_avx2.onnx)
+ONNX_QUANT = {"avx2": "quint8", "avx512": "qint8", "avx512_vnni": "qint8", "arm64": "qint8"}
 
-    with open(input_path, "r", encoding="utf-8") as fin, \
-         open(output_path, "w", encoding="utf-8") as fout:
+def model_files(backend, quantize=None):
+    if backend == "onnx":
+        return f"onnx/model_{ONNX_QUANT[quantize]}_{quantize}.onnx" if quantize else "onnx/model.onnx"
+    if backend == "openvino":
+        return "openvino/openvino_model_qint8_quantized.xml" if quantize else "openvino/openvino_model.xml"
+    return None
 
-        for line in fin:
-            line = line.strip()
-            if not line:
-                continue
+def cache_model_name(backend="torch", quantize=None):
+    # vectors from different backends/quantizations are not interchangeable;
+    # the torch name stays unsuffixed so existing caches keep working
+    if backend == "torch":
+        return EMBED_MODEL
+    return f"{EMBED_MODEL}|{backend}|{quantize or 'fp32'}"
 
-            item = json.loads(line)
+def load_model(backend="torch", quantize=None, threads=0):
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown embedding backend: {backend}")
+    if backend == "onnx" and quantize and quantize not in ONNX_QUANT:
+        raise ValueError(f"onnx quantization must be one of {tuple(ONNX_QUANT)}")
+    if backend == "openvino" and quantize not in (None, "qint8"):
+        raise ValueError("openvino quantization must be qint8")
+    if backend == "torch" and quantize:
+        raise ValueError("quantization needs the onnx or openvino backend")
 
-            head_text = item["head"]["text"]
-            rel_text = item["relation"]
-            tail_text = item["tail"]["text"]
+    model_kwargs = {}
+    file_name = model_files(backend, quantize)
+    if file_name:
+        model_kwargs["file_name"] = file_name
 
-            item["head"]["embedding"] = get_embedding(head_text, entity_cache)
-            item["relation_embedding"] = get_embedding(rel_text, relation_cache)
-            item["tail"]["embedding"] = get_embedding(tail_text, entity_cache)
+    if threads > 0:
+        if backend == "torch":
+            import torch
+            torch.set_num_threads(threads)
+        elif backend == "onnx":
+            import onnxruntime as ort
+            opts = ort.SessionOptions()
+            opts.intra_op_num_threads = threads
+            opts.inter_op_num_threads = 1
+            model_kwargs["session_options"] = opts
+        else:
+            model_kwargs["ov_config"] = {"INFERENCE_NUM_THREADS": threads}
 
-            fout.write(json.dumps(item, ensure_ascii=False) + "\n")
+    return SentenceTransformer(EMBED_MODEL, device="cpu", backend=backend, model_kwargs=model_kwargs or None)
+
+def encode_texts(model, texts, batch_size=BATCH_SIZE, num_workers=0):
+    # length-sorted batches keep padding per batch small
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    sorted_texts = [texts[i] for i in order]
+
+    if num_workers > 1:
+        pool = model.start_multi_process_pool(["cpu"] * num_workers)
+        try:
+            embs = model.encode_multi_process(sorted_texts, pool, batch_size=batch_size)
+        finally:
+            model.stop_multi_process_pool(pool)
+    else:
+        embs = model.encode(sorted_texts, batch_size=batch_size, convert_to_numpy=True)
+
+    out = np.empty_like(embs)
+    out[order] = embs
+    return out
+
+def encode_static(texts):
+    from model2vec import StaticModel
+    model = StaticModel.from_pretrained(STATIC_MODEL)
+    if not texts:
+        return np.zeros((0, model.dim), dtype=np.float32)
+    return np.asarray(model.encode(texts), dtype=np.float32)
+
+def embed_records(records, batch_size=BATCH_SIZE, num_workers=0, cache_path=None, backend="torch", quantize=None, threads=0, mode="transformer"):
+    # (unique texts, main matrix, static matrix or None); entities and relations
+    # share the encoder, so each unique string is encoded once
+    if mode not in EMBED_MODES:
+        raise ValueError(f"unknown embedding mode: {mode}")
+
+    texts = {}
+    for item in records:
+        for t in (item["head"]["text"], item["relation"], item["tail"]["text"]):
+            texts.setdefault(t, None)
+    texts = list(texts)
+
+    if mode == "static":
+        return texts, encode_static(texts), None
+
+    cache = EmbeddingCache(cache_path, cache_model_name(backend, quantize)) if cache_path else None
+    found = cache.get_many(texts) if cache else {}
+    misses = [t for t in texts if t not in found]
+
+    # the model is only loaded when something actually needs encoding
+    if misses:
+        model = load_model(backend, quantize, threads) #Disable CPU as the default.
+        new_embs = encode_texts(model, misses, batch_size, num_workers)
+        found.update(zip(misses, new_embs))
+        if cache:
+            cache.put_many(misses, new_embs)
+
+    if cache:
+        print(f"[STEP5] embedding cache: {cache.hits}/{len(texts)} hits ({cache.hit_rate():.1%}), {len(misses)} encoded")
+        add_counts(nlkp=len(texts), nhit=cache.hits)
+        cache.close()
+
+    embs = np.stack([found[t] for t in texts]) if texts else np.zeros((0, 0), dtype=np.float32)
+    return texts, embs, encode_static(texts) if mode == "hybrid" else None
+
+def step5(input_path, output_path, batch_size=BATCH_SIZE, num_workers=0, dtype="float32", cache_path=None, backend="torch", quantize=None, threads=0, mode="transformer"):
+    texts, embs, static = embed_records(read_jsonl(input_path), batch_size, num_workers, cache_path,
+                                        backend, quantize, threads, mode)
+    save_embeddings(output_path, texts, embs, dtype, static)
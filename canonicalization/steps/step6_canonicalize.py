@@ -1,61 +1,33 @@
-import json, numpy as np
+import asyncio, json, time, numpy as np
 from collections import defaultdict
-from rank_bm25 import BM25Okapi
-from sklearn.metrics.pairwise import cosine_similarity
-from steps.utils import MODEL_MAP, get_client
+from steps.utils import MODEL_MAP, get_client, get_async_client
+from steps.embeddings import load_embeddings, load_static, normalize_rows
+from steps.bm25_index import BM25Index
+from steps.vector_index import VectorIndex
+from steps.lsh_blocking import LSHBlocker
+from steps.premerge import premerge, entity_key, relation_key
+from steps.pool_workers import PoolWorkers
+from steps.canon_store import CanonStore
+from steps.partitions import PartitionStore
+from steps.step_stats import add_counts, add_usage
+from steps.jsonl import read_jsonl, write_jsonl
 
 TOP_K = 16
 BM25_WEIGHT = 0.5
 EMB_WEIGHT = 0.5
-
-def step6(input_path, out_path, model_key, api_base=None):
-    client = get_client(api_base)
-    MODEL_NAME = MODEL_MAP[model_key]
-
-    def load_jsonl(path):
-        with open(path, "r", encoding="utf-8") as f:
-            return [json.loads(l) for l in f]
-
-    data = load_jsonl(input_path)
-
-    entities = defaultdict(dict)
-    relations = defaultdict(dict)
-
-    for row in data:
-        h, t = row["head"], row["tail"]
-        r = row["relation"]
-
-        entities[h["type"]][h["text"]] = np.array(h["embedding"])
-        entities[t["type"]][t["text"]] = np.array(t["embedding"])
-
-        key = (h["type"], t["type"])
-        relations[key][r] = np.array(row["relation_embedding"])
-
-    def get_topk(query_text, query_emb, texts, embs, k=TOP_K, min_sim=0.75):
-        tokenized = [t.lower().split() for t in texts]
-        bm25 = BM25Okapi(tokenized)
-        bm25_scores = bm25.get_scores(query_text.lower().split())
-
-        emb_scores = cosine_similarity(
-            query_emb.reshape(1, -1),
-            np.stack(embs)
-        )[0]
-
-        scores = BM25_WEIGHT * bm25_scores + EMB_WEIGHT * emb_scores
-        idx = np.argsort(scores)[::-1]
-
-        filtered = [texts[i] for i in idx if emb_scores[i] >= min_sim]
-        if not filtered:
-            return []
-        return filtered[:k]
-
-    def ask_llm(item, candidates, item_type):
-        if not candidates:
-            return [], None
-
-        cand_text = "\n".join(f"- {c}" for c in candidates)
-
-        prompt = f"""
+MIN_SIM = 0.75
+# MIN_SIM is tuned on MiniLM cosines. --embed_mode static scores with
+# model2vec vectors, on another scale and with no re-rank, so it gets its own,
+# looser cut-off to keep recall; check a value on your data with
+# check_embed_backend.py --backend static --min_sim X
+STATIC_MIN_SIM = 0.65
+ANN_K = 4 * TOP_K
+SEED_WINDOW = 4  # parallel mode scans up to round_size * SEED_WINDOW seeds per round
+
+def build_prompt(item, candidates, item_type):
+    cand_text = "\n".join(f"- {c}" for c in candidates)
+
+    return f"""
 Find duplicate {item_type} for the item and an alias that best
 represents the duplicates. Duplicates are those that are the same
 in meaning, such as with variation in tense, plural form, stem form,
@@ -77,72 +49,534 @@ If there are no duplicates, return:
 If duplicates is non-empty, canonical MUST be one of [Item or Candidates].
 """.strip()
 
-        response = client.responses.create(
-            model=MODEL_NAME,
-            input=prompt,
-            max_output_tokens=256,
-            temperature=0.0,
-        )
+def parse_reply(text):
+    text = text.strip()
+    s, e = text.index("{"), text.rindex("}") + 1
+    j = json.loads(text[s:e])
+    return j.get("duplicates", []), j.get("canonical")
 
-        text = response.output_text.strip()
-        s, e = text.index("{"), text.rindex("}") + 1
-        j = json.loads(text[s:e])
-        return j.get("duplicates", []), j.get("canonical")
+def build_batch_prompt(groups, item_type):
+    blocks = []
+    for gid, (item, candidates) in enumerate(groups, 1):
+        cand_text = "\n".join(f"- {c}" for c in candidates)
+        blocks.append(f"Group {gid}:\nItem:\n{item}\n\nCandidates:\n{cand_text}")
+    groups_text = "\n\n".join(blocks)
 
-    entity_clusters = {}
+    return f"""
+Each group below has an item and its candidates. For EACH group independently,
+find duplicate {item_type} for the item and an alias that best
+represents the duplicates. Duplicates are those that are the same
+in meaning, such as with variation in tense, plural form, stem form,
+case, abbreviation, shorthand.
 
-    for etype, pool in entities.items():
-        remaining = dict(pool)
-        while remaining:
-            a, a_emb = next(iter(remaining.items()))
-            texts = list(remaining.keys())
-            embs = list(remaining.values())
+If semantic equivalence is clear, merge.
+If uncertain, do NOT merge, but ALWAYS return valid JSON.
 
-            topk = get_topk(a, a_emb, texts, embs)
-            candidates = [t for t in topk if t != a]
+{groups_text}
 
-            dups, canon = ask_llm(a, candidates, "entity")
-            dups = [d for d in dups if isinstance(d, str)]
+Return JSON only. Do not include explanations or text outside JSON.
+Return one JSON object keyed by group number, for example:
+{{ "1": {{ "duplicates": [...], "canonical": "..." }}, "2": {{ "duplicates": [], "canonical": null }} }}
 
-            if dups and canon:
-                cluster = set([a] + dups)
-                entity_clusters[canon] = cluster
-                for x in cluster:
-                    remaining.pop(x, None)
-            else:
-                remaining.pop(a)
+For a group with no duplicates, use {{ "duplicates": [], "canonical": null }}.
+If duplicates is non-empty, canonical MUST be one of [Item or Candidates] of that group.
+""".strip()
 
-    edge_clusters = {}
+def parse_batch_reply(text, n_groups):
+    # {group index: (duplicates, canonical)} for the groups that parsed
+    try:
+        text = text.strip()
+        s, e = text.index("{"), text.rindex("}") + 1
+        j = json.loads(text[s:e])
+    except ValueError:
+        return {}
+
+    out = {}
+    for gid in range(1, n_groups + 1):
+        g = j.get(str(gid)) if isinstance(j, dict) else None
+        if isinstance(g, dict) and isinstance(g.get("duplicates", []), list):
+            out[gid - 1] = (g.get("duplicates", []), g.get("canonical"))
+    return out
+
+def count_usage(usage, response):
+    add_counts(ncll=1)
+    add_usage(response)
+    usage["calls"] += 1
+    u = getattr(response, "usage", None)
+    if u is not None:
+        usage["input_tokens"] += getattr(u, "input_tokens", 0) or 0
+        usage["output_tokens"] += getattr(u, "output_tokens", 0) or 0
+
+def get_topk(query_id, texts, bm25, vindex, k=TOP_K, min_sim=MIN_SIM, block=None):
+    # embedding neighbours from the ANN index, plus every BM25 posting hit:
+    # items sharing no query term have BM25 = 0 and rank by embedding alone,
+    # so the ANN top-ANN_K already covers them.
+    # With an LSH block, only the block is scored (no ANN search).
+    if block is not None:
+        hits = bm25.scores(texts[query_id], block)
+        ids = np.array(sorted(block), dtype=np.int64)
+    else:
+        ann_ids, _ = vindex.search(query_id, ANN_K, min_sim)
+        hits = bm25.scores(texts[query_id])
+        ids = np.array(sorted(set(ann_ids.tolist()) | hits.keys()), dtype=np.int64)
+    emb_scores = vindex.similarity(query_id, ids)
+
+    keep = emb_scores >= min_sim
+    if not keep.any():
+        return []
+    ids, emb_scores = ids[keep], emb_scores[keep]
+
+    bm25_scores = np.array([hits.get(i, 0.0) for i in ids.tolist()])
+
+    scores = BM25_WEIGHT * bm25_scores + EMB_WEIGHT * emb_scores
+    idx = np.argsort(scores)[::-1][:k]
+    return [texts[ids[i]] for i in idx]
+
+class PoolState:
+    # the first n_fixed texts (stored canonicals) are candidates but never seeds
+    # lsh: (bands, rows) to score only items sharing a MinHash block
+    # min_sim: cosine cut-off for candidates, calibrated for `mat`
+    def __init__(self, texts, mat, n_fixed=0, search_mat=None, lsh=None, min_sim=MIN_SIM):
+        self.texts = texts
+        self.min_sim = min_sim
+        self.bm25 = BM25Index(texts)
+        self.vindex = VectorIndex(mat, search_mat=search_mat)
+        self.blocker = LSHBlocker(texts, *lsh) if lsh else None
+        self.ids = {t: i for i, t in enumerate(texts)}
+        self.remaining = {t: i for i, t in enumerate(texts) if i >= n_fixed}
+
+    def candidates(self, a):
+        i = self.ids[a]
+        block = self.blocker.block(i) if self.blocker else None
+        topk = get_topk(i, self.texts, self.bm25, self.vindex, min_sim=self.min_sim, block=block)
+        return [t for t in topk if t != a]
+
+    def drop(self, x):
+        self.remaining.pop(x, None)
+        i = self.ids.pop(x, None)
+        if i is not None:
+            self.bm25.remove(i)
+            self.vindex.remove(i)
+            if self.blocker:
+                self.blocker.remove(i)
+
+def pool_state(vecs, texts, rows, anchors=(), anchor_mat=None, static=None, lsh=None, min_sim=MIN_SIM):
+    # static: model2vec matrix for candidate search; stored canonicals only
+    # have main-model vectors, so pools with anchors search the main space
+    mat = normalize_rows(vecs[rows])
+    search_mat = normalize_rows(static[rows]) if static is not None and not len(anchors) else None
+    if len(anchors):
+        mat = np.vstack([anchor_mat, mat])
+    return PoolState(list(anchors) + texts, mat, n_fixed=len(anchors), search_mat=search_mat, lsh=lsh, min_sim=min_sim)
+
+def pin_anchors(clusters, anchors):
+    # a cluster that absorbed stored canonicals keeps the first one's name, so
+    # canonical names stay stable across runs; the others are re-pointed to it
+    order = {a: i for i, a in enumerate(anchors)}
+    pinned, repointed = {}, {}
+    for canon, members in clusters.items():
+        hit = sorted((m for m in members if m in order), key=order.get)
+        if hit:
+            canon = hit[0]
+            repointed.update((a, canon) for a in hit[1:])
+        pinned.setdefault(canon, set()).update(members)
+    return pinned, repointed
+
+def resolve_pool(state, item_type, ask, clusters):
+    while state.remaining:
+        a = next(iter(state.remaining))
+        candidates = state.candidates(a)
+
+        dups, canon = ask(a, candidates, item_type)
+        dups = [d for d in dups if isinstance(d, str)]
+
+        if dups and canon:
+            cluster = set([a] + dups)
+            clusters[canon] = cluster
+            for x in cluster:
+                state.drop(x)
+        else:
+            state.drop(a)
+
+def find(parent, x):
+    while parent[x] != x:
+        parent[x] = parent[parent[x]]
+        x = parent[x]
+    return x
+
+def select_round(state, round_size):
+    # speculative round: seeds (in pool order) whose item + candidate sets do not overlap
+    # (not always the seeds / candidates the serial loop would ask: claimed items
+    # are skipped, and BM25 statistics still cover the whole live pool)
+    groups, claimed, asked, skipped = [], set(), 0, 0
+    for a in state.remaining:
+        if asked >= round_size or skipped >= round_size * SEED_WINDOW:
+            break
+        if a in claimed:
+            skipped += 1
+            continue
+        candidates = state.candidates(a)
+        group = {a, *candidates}
+        if group & claimed:
+            skipped += 1
+            continue
+        claimed |= group
+        groups.append((a, candidates))
+        asked += bool(candidates)
+    return groups
+
+def apply_round(state, groups, replies, clusters):
+    # apply in seed order; clusters touching each other (only possible when the
+    # LLM names items outside its candidate list) are merged with union-find
+    parent = {}
+    seed_canon = {}
+    for (a, _), (dups, canon) in zip(groups, replies):
+        dups = [d for d in dups if isinstance(d, str)]
+        if not (dups and canon):
+            continue
+        seed_canon[a] = canon
+        for x in [a] + dups:
+            parent.setdefault(x, x)
+            ra, rx = find(parent, a), find(parent, x)
+            if ra != rx:
+                parent[rx] = ra
+
+    members = defaultdict(set)
+    for x in parent:
+        members[find(parent, x)].add(x)
+
+    done = set()
+    for a, _ in groups:
+        if a not in parent:
+            state.drop(a)
+            continue
+        root = find(parent, a)
+        if a not in seed_canon or root in done:
+            continue
+        done.add(root)
+        clusters[seed_canon[a]] = members[root]
+        for x in members[root]:
+            state.drop(x)
+
+async def resolve_pool_async(state, item_type, ask_many, clusters, round_size):
+    while state.remaining:
+        groups = select_round(state, round_size)
+        replies = await ask_many(groups, item_type)
+        apply_round(state, groups, replies, clusters)
+
+async def resolve_pool_remote(workers, pool_id, prepared, item_type, ask_many, clusters, round_size):
+    # same loop as resolve_pool_async, but retrieval state lives in a worker process
+    loop = asyncio.get_running_loop()
+
+    def call(*msg):
+        return loop.run_in_executor(None, workers.call, pool_id, msg)
+
+    await call("init", *prepared)
+    groups = await call("round", round_size)
+    while groups:
+        replies = await ask_many(groups, item_type)
+        new_clusters, groups = await call("apply", groups, replies, round_size)
+        clusters.update(new_clusters)
+
+def prepare_pool(key, pool, item_type, store, use_premerge, premerged, known):
+    # (new texts, their embedding rows, stored canonicals, their vectors);
+    # records pre-merged and store-known aliases in premerged / known
+    texts = list(pool)
+    anchors, anchor_mat = [], None
+    if store:
+        aliases, anchors, anchor_mat = store.load_pool(item_type, key)
+        hit = {t: aliases[t] for t in texts if t in aliases}
+        if hit:
+            known.update(hit)
+            texts = [t for t in texts if t not in hit]
+        add_counts(nlkp=len(pool), nhit=len(hit))
+        print(f"[STEP6] store {item_type} {key}: {len(hit)} known, {len(texts)} new, "
+              f"{len(anchors)} stored canonicals")
+    if use_premerge and texts:
+        # stored canonicals go first, so they represent any group they fall into
+        groups = premerge(anchors + texts, entity_key if item_type == "entity" else relation_key)
+        fixed = set(anchors)
+        aliases = {m: rep for rep, members in groups.items() for m in members[1:] if m not in fixed}
+        if aliases:
+            premerged.update(aliases)
+            n = len(texts)
+            texts = [t for t in texts if t not in aliases]
+            print(f"[STEP6] pre-merge {item_type} {key}: {len(aliases)} aliases merged without LLM "
+                  f"({n} -> {len(texts)} items)")
+    return texts, [pool[t] for t in texts], anchors, anchor_mat
+
+def llm_asker(client, model_name, usage):
+    def ask_llm(item, candidates, item_type):
+        if not candidates:
+            return [], None
 
-    for key, pool in relations.items():
-        remaining = dict(pool)
-        while remaining:
-            a, a_emb = next(iter(remaining.items()))
-            texts = list(remaining.keys())
-            embs = list(remaining.values())
+        response = client.responses.create(
+            model=model_name,
+            input=build_prompt(item, candidates, item_type),
+            max_output_tokens=256,
+            temperature=0.0,
+        )
+        count_usage(usage, response)
+        return parse_reply(response.output_text)
+
+    return ask_llm
+
+def async_asker(aclient, model_name, concurrency, batch_size, usage, timing):
+    # ask_many(groups, item_type) for the round loops; the semaphore bounds
+    # in-flight requests across every pool sharing this asker
+    sem = asyncio.Semaphore(concurrency)
+
+    async def call(prompt, max_tokens):
+        async with sem:
+            t0 = time.time()
+            response = await aclient.responses.create(
+                model=model_name,
+                input=prompt,
+                max_output_tokens=max_tokens,
+                temperature=0.0,
+            )
+            timing["serial"] += time.time() - t0
+        count_usage(usage, response)
+        return response.output_text
+
+    async def ask_one(item, candidates, item_type):
+        return parse_reply(await call(build_prompt(item, candidates, item_type), 256))
+
+    async def ask_chunk(chunk, item_type):
+        if len(chunk) == 1:
+            return [await ask_one(*chunk[0], item_type)]
+
+        parsed = parse_batch_reply(
+            await call(build_batch_prompt(chunk, item_type), 256 * len(chunk)), len(chunk)
+        )
+        # groups the batched reply did not cover fall back to single calls
+        missing = [i for i in range(len(chunk)) if i not in parsed]
+        retried = await asyncio.gather(*(ask_one(*chunk[i], item_type) for i in missing))
+        parsed.update(zip(missing, retried))
+        return [parsed[i] for i in range(len(chunk))]
+
+    async def ask_many(groups, item_type):
+        replies = [([], None)] * len(groups)
+        todo = [i for i, (_, candidates) in enumerate(groups) if candidates]
+        chunks = [todo[i:i + batch_size] for i in range(0, len(todo), batch_size)]
+
+        results = await asyncio.gather(*(
+            ask_chunk([groups[i] for i in chunk], item_type) for chunk in chunks
+        ))
+        for chunk, res in zip(chunks, results):
+            for i, reply in zip(chunk, res):
+                replies[i] = reply
+        return replies
+
+    return ask_many
+
+def report_llm(usage, timing=None, wall=0.0):
+    if timing is not None and wall > 0:
+        print(f"[STEP6] wall {wall:.1f}s vs serial LLM time {timing['serial']:.1f}s "
+              f"({timing['serial'] / wall:.1f}x)")
+    print(f"[STEP6] {usage['calls']} LLM calls, {usage['input_tokens']} prompt tokens, "
+          f"{usage['output_tokens']} output tokens")
+
+def store_pool(store, key, pool, item_type, m, vecs, vocab, anchors, repointed):
+    # persist one pool's alias map and the vectors of its new canonicals
+    aliases = {t: m.get(t, t) for t in pool}
+    stored = set(anchors) - set(repointed)
+    canon_vecs = {}
+    for t, c in list(aliases.items()):
+        if c in stored or c in canon_vecs:
+            continue
+        # a canonical name the LLM made up has no vector; use its first alias'
+        canon_vecs[c] = normalize_rows(vecs[[vocab.get(c, pool[t])]])[0]
+        aliases.setdefault(c, c)
+    store.save_pool(item_type, key, aliases, canon_vecs, repointed)
+
+def canonicalize(data, vocab, vecs, model_key, api_base=None, concurrency=1, batch_size=1, use_premerge=True, workers=0, store_path=None, emb_path=None, static=None, lsh=None, min_sim=MIN_SIM):
+    # rewrites the rows in data in place and returns them; worker processes
+    # memory-map the embeddings themselves, so they need emb_path
+    if workers > 0 and emb_path is None:
+        raise ValueError("step6 workers need the embeddings on disk (emb_path)")
+
+    MODEL_NAME = MODEL_MAP[model_key]
+    store = CanonStore(store_path) if store_path else None
+
+    entities = defaultdict(dict)
+    relations = defaultdict(dict)
 
-            topk = get_topk(a, a_emb, texts, embs)
-            candidates = [t for t in topk if t != a]
+    # pools map text -> row in the memory-mapped embedding matrix
+    for row in data:
+        h, t = row["head"], row["tail"]
+        r = row["relation"]
 
-            dups, canon = ask_llm(a, candidates, "relation")
-            dups = [d for d in dups if isinstance(d, str)]
+        entities[h["type"]][h["text"]] = vocab[h["text"]]
+        entities[t["type"]][t["text"]] = vocab[t["text"]]
 
-            if dups and canon:
-                cluster = set([a] + dups)
-                edge_clusters[canon] = cluster
-                for x in cluster:
-                    remaining.pop(x, None)
+        key = (h["type"], t["type"])
+        relations[key][r] = vocab[r]
+
+    # alias -> representative, merged by normalization key before the LLM pass
+    premerged = {"entity": {}, "relation": {}}
+    # alias -> canonical, already decided by an earlier run (canon store)
+    known = {"entity": {}, "relation": {}}
+
+    pools = [(k, pool, "entity") for k, pool in entities.items()] + [(k, pool, "relation") for k, pool in relations.items()]
+    prepared = [
+        prepare_pool(key, pool, item_type, store, use_premerge, premerged[item_type], known[item_type])
+        for key, pool, item_type in pools
+    ]
+    # pools with nothing new to resolve cost no retrieval and no LLM calls
+    todo = [i for i, prep in enumerate(prepared) if prep[0]]
+    pool_clusters = [{} for _ in pools]
+    usage = {"calls": 0, "input_tokens": 0, "output_tokens": 0}
+
+    if concurrency <= 1 and batch_size <= 1 and workers <= 0:
+        ask_llm = llm_asker(get_client(api_base), MODEL_NAME, usage)
+        for i in todo:
+            resolve_pool(pool_state(vecs, *prepared[i], static=static, lsh=lsh, min_sim=min_sim), pools[i][2], ask_llm, pool_clusters[i])
+        report_llm(usage)
+    else:
+        # pools run concurrently; the semaphore bounds in-flight requests overall
+        timing = {"serial": 0.0}
+
+        async def run_all():
+            ask_many = async_asker(get_async_client(api_base), MODEL_NAME, concurrency, batch_size, usage, timing)
+            round_size = concurrency * batch_size
+            if workers > 0:
+                # CPU-heavy retrieval runs in worker processes that memory-map the
+                # embedding matrix themselves; only texts and row ids are sent over
+                await asyncio.gather(*(
+                    resolve_pool_remote(pool_workers, i, prepared[i], pools[i][2], ask_many, pool_clusters[i], round_size)
+                    for i in todo
+                ))
             else:
-                remaining.pop(a)
+                await asyncio.gather(*(
+                    resolve_pool_async(pool_state(vecs, *prepared[i], static=static, lsh=lsh, min_sim=min_sim), pools[i][2], ask_many, pool_clusters[i], round_size)
+                    for i in todo
+                ))
+
+        pool_workers = PoolWorkers(workers, emb_path, lsh, min_sim) if workers > 0 else None
+        t0 = time.time()
+        try:
+            asyncio.run(run_all())
+        finally:
+            if pool_workers:
+                pool_workers.close()
+        report_llm(usage, timing, time.time() - t0)
+
+    # merge in pool order so the result does not depend on completion order
+    entity_clusters = {}
+    edge_clusters = {}
+    repointed = [{} for _ in pools]
+    for i, (_, _, item_type) in enumerate(pools):
+        clusters = pool_clusters[i]
+        if store:
+            clusters, repointed[i] = pin_anchors(clusters, prepared[i][2])
+        (entity_clusters if item_type == "entity" else edge_clusters).update(clusters)
 
     entity_map = {alias: canon for canon, aliases in entity_clusters.items() for alias in aliases}
     relation_map = {alias: canon for canon, aliases in edge_clusters.items() for alias in aliases}
 
+    # pre-merged aliases follow wherever the LLM pass sent their representative,
+    # and stored decisions follow their canonical if it was merged this run
+    for item_type, m in (("entity", entity_map), ("relation", relation_map)):
+        for alias, rep in premerged[item_type].items():
+            m[alias] = m.get(rep, rep)
+        for alias, canon in known[item_type].items():
+            m[alias] = m.get(canon, canon)
+
+    if store:
+        for i, (key, pool, item_type) in enumerate(pools):
+            m = entity_map if item_type == "entity" else relation_map
+            store_pool(store, key, pool, item_type, m, vecs, vocab, prepared[i][2], repointed[i])
+        store.close()
+
     for row in data:
         row["head"]["text"] = entity_map.get(row["head"]["text"], row["head"]["text"])
         row["tail"]["text"] = entity_map.get(row["tail"]["text"], row["tail"]["text"])
         row["relation"] = relation_map.get(row["relation"], row["relation"])
 
-    with open(out_path, "w", encoding="utf-8") as f:
-        for row in data:
-            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    return data
+
+def canonicalize_partitioned(input_path, emb_path, out_path, model_key, api_base=None, concurrency=1, batch_size=1, use_premerge=True, store_path=None, lsh=None, min_sim=MIN_SIM):
+    # out-of-core step6: pool members go to on-disk partitions, each pool is
+    # loaded and resolved on its own, its decisions go back to disk, and the
+    # folded alias map is applied to the rows in a streaming pass, so memory is
+    # bounded by the largest pool. Output matches the in-memory step6.
+    MODEL_NAME = MODEL_MAP[model_key]
+    vecs, static = np.load(emb_path, mmap_mode="r"), load_static(emb_path)
+    store = CanonStore(store_path) if store_path else None
+    parts = PartitionStore(out_path + ".parts.sqlite", emb_path)
+    parts.add_rows(read_jsonl(input_path))
+    print(f"[STEP6] out-of-core: {len(parts.pools)} partitions")
+    usage = {"calls": 0, "input_tokens": 0, "output_tokens": 0}
+
+    def partitions():
+        for pid, item_type, key in parts.partitions():
+            pool = parts.load(pid)
+            premerged, known = {}, {}
+            prep = prepare_pool(key, pool, item_type, store, use_premerge, premerged, known)
+            yield key, pool, item_type, prep, premerged, known
+
+    repointed = {}  # pool key -> stored canonicals merged away this run
+
+    def finish(key, pool, item_type, prep, premerged, known, clusters):
+        if store:
+            clusters, repointed[item_type, key] = pin_anchors(clusters, prep[2])
+        parts.add_pool(item_type, clusters, premerged, known)
+
+    if concurrency <= 1 and batch_size <= 1:
+        ask_llm = llm_asker(get_client(api_base), MODEL_NAME, usage)
+        for key, pool, item_type, prep, premerged, known in partitions():
+            clusters = {}
+            if prep[0]:
+                resolve_pool(pool_state(vecs, *prep, static=static, lsh=lsh, min_sim=min_sim), item_type, ask_llm, clusters)
+            finish(key, pool, item_type, prep, premerged, known, clusters)
+        report_llm(usage)
+    else:
+        # one pool at a time; concurrency only applies within a pool's rounds
+        timing = {"serial": 0.0}
+
+        async def run_all():
+            ask_many = async_asker(get_async_client(api_base), MODEL_NAME, concurrency, batch_size, usage, timing)
+            for key, pool, item_type, prep, premerged, known in partitions():
+                clusters = {}
+                if prep[0]:
+                    await resolve_pool_async(pool_state(vecs, *prep, static=static, lsh=lsh, min_sim=min_sim), item_type, ask_many,
+                                             clusters, concurrency * batch_size)
+                finish(key, pool, item_type, prep, premerged, known, clusters)
+
+        t0 = time.time()
+        asyncio.run(run_all())
+        report_llm(usage, timing, time.time() - t0)
+
+    parts.build_aliases()
+    if store:
+        # stored only once the alias map is final, as in the in-memory step6
+        for pid, item_type, key in parts.partitions():
+            pool = parts.load(pid)
+            m = {t: parts.canonical(item_type, t) for t in pool}
+            anchors = store.load_pool(item_type, key)[1]
+            store_pool(store, key, pool, item_type, m, vecs, parts, anchors, repointed.get((item_type, key), {}))
+        store.close()
+
+    def rows():
+        for row in read_jsonl(input_path):
+            row["head"]["text"] = parts.canonical("entity", row["head"]["text"])
+            row["tail"]["text"] = parts.canonical("entity", row["tail"]["text"])
+            row["relation"] = parts.canonical("relation", row["relation"])
+            yield row
+
+    write_jsonl(out_path, rows())
+    parts.close()
+
+def step6(input_path, emb_path, out_path, model_key, api_base=None, concurrency=1, batch_size=1, use_premerge=True, workers=0, store_path=None, lsh=None, out_of_core=False, min_sim=MIN_SIM):
+    if out_of_core:
+        if workers > 0:
+            raise ValueError("out-of-core step6 resolves one pool at a time; it does not use workers")
+        canonicalize_partitioned(input_path, emb_path, out_path, model_key, api_base, concurrency, batch_size,
+                                 use_premerge, store_path, lsh, min_sim)
+        return
+    data = list(read_jsonl(input_path))
+    vocab, vecs = load_embeddings(emb_path)
+    data = canonicalize(data, vocab, vecs, model_key, api_base, concurrency, batch_size,
+                        use_premerge, workers, store_path, emb_path, load_static(emb_path), lsh, min_sim)
+    write_jsonl(out_path, data)
@@ -1,23 +1,33 @@
-import json
-from collections import defaultdict
 import os
+from steps.triple_io import write_rows
+from steps.jsonl import read_jsonl
 
-def step8(input_path, output_path):
-    rows = defaultdict(list)
+def restore_rows(records, n_rows=None):
+    # records arrive in row_id order (step2 numbering), so a row is complete as
+    # soon as the next row_id shows up; rows without triples come out empty.
+    # With n_rows, leading/trailing empty rows are kept as well.
+    cur_id, cur = None, []
 
-    with open(input_path, "r", encoding="utf-8") as f:
-        for line in f:
-            obj = json.loads(line)
-            row_id = obj["row_id"]
-            h = obj["head"]["text"]
-            r = obj["relation"]
-            t = obj["tail"]["text"]
-            rows[row_id].append([h, r, t])
+    for obj in records:
+        row_id = obj["row_id"]
+        if row_id != cur_id:
+            if cur_id is not None:
+                if row_id < cur_id:
+                    raise ValueError(f"step8 expects rows in row_id order ({row_id} after {cur_id})")
+                yield cur
+                yield from ([] for _ in range(cur_id + 1, row_id))
+            elif n_rows is not None:
+                yield from ([] for _ in range(row_id))
+            cur_id, cur = row_id, []
+        cur.append([obj["head"]["text"], obj["relation"], obj["tail"]["text"]])
 
-    min_row = min(rows.keys())
-    max_row = max(rows.keys())
+    if cur_id is None:
+        yield from ([] for _ in range(n_rows or 0))
+        return
+    yield cur
+    if n_rows is not None:
+        yield from ([] for _ in range(cur_id + 1, n_rows))
 
+def step8(input_path, output_path, n_rows=None):
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    with open(output_path, "w", encoding="utf-8") as f:
-        for row_id in range(min_row, max_row + 1):
-            f.write(json.dumps(rows.get(row_id, []), ensure_ascii=False) + "\n")
+    write_rows(output_path, restore_rows(read_jsonl(input_path), n_rows))
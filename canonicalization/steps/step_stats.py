@@ -0,0 +1,121 @@
+import json, os, threading, time
+from contextlib import contextmanager
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Per-step profile for run.py, written to work/<dataset>/stats.json.
+# Keys follow the construction pipeline's stats.json (ncll LLM calls, titk /
+# totk input / output tokens, tsec wall seconds), plus
+#   tctk  cached input tokens (provider prompt cache)
+#   tcpu  CPU seconds, including finished child processes (step5/step6 workers)
+#   prss  peak RSS in MB (process + children, sampled; without psutil the
+#         process high-water mark so far)
+#   nitm  records the step produced
+#   nlkp / nhit  cache lookups / hits (step3 label cache, step5 embedding
+#         cache, step6 canon store)
+# Steps report counters through add_counts / add_usage; outside a profiled
+# step those are no-ops.
+
+COUNTERS = ("ncll", "titk", "totk", "tctk", "nitm", "nlkp", "nhit")
+SAMPLE_SEC = 0.05
+
+_lock = threading.Lock()
+_current = None
+
+def add_counts(**counts):
+    with _lock:
+        if _current is not None:
+            for k, v in counts.items():
+                _current[k] += v
+
+def add_usage(response):
+    # token usage of a Responses API or Chat Completions reply
+    u = getattr(response, "usage", None)
+    if u is None:
+        return
+    details = getattr(u, "input_tokens_details", None) or getattr(u, "prompt_tokens_details", None)
+    add_counts(
+        titk=getattr(u, "input_tokens", None) or getattr(u, "prompt_tokens", 0) or 0,
+        totk=getattr(u, "output_tokens", None) or getattr(u, "completion_tokens", 0) or 0,
+        tctk=getattr(details, "cached_tokens", 0) or 0,
+    )
+
+def cpu_seconds():
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+def rss_mb():
+    if psutil is None:
+        import resource
+        # ru_maxrss is in KB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    proc = psutil.Process()
+    total = proc.memory_info().rss
+    for child in proc.children(recursive=True):
+        try:
+            total += child.memory_info().rss
+        except psutil.Error:
+            pass
+    return total / (1 << 20)
+
+class RssSampler:
+    def __init__(self):
+        self.peak = rss_mb()
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.done.wait(SAMPLE_SEC):
+            self.peak = max(self.peak, rss_mb())
+
+    def stop(self):
+        self.done.set()
+        self.thread.join()
+        return max(self.peak, rss_mb())
+
+@contextmanager
+def profile_step(stats, name):
+    # stats[name] = this step's record; counters reported inside go to it
+    global _current
+    rec = dict.fromkeys(COUNTERS, 0)
+    sampler = RssSampler()
+    t0, c0 = time.time(), cpu_seconds()
+    with _lock:
+        _current = rec
+    try:
+        yield rec
+    finally:
+        with _lock:
+            _current = None
+        rec["tsec"] = time.time() - t0
+        rec["tcpu"] = cpu_seconds() - c0
+        rec["prss"] = round(sampler.stop(), 1)
+        stats[name] = rec
+
+def save_stats(path, stats):
+    ran = [rec for rec in stats.values() if not rec.get("skipped")]
+    total = {k: sum(rec[k] for rec in ran) for k in COUNTERS + ("tsec", "tcpu")}
+    total["prss"] = max((rec["prss"] for rec in ran), default=0.0)
+    out = {**stats, "total": total}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(out, f, indent=2)
+
+    print(f"\n{'='*50}")
+    print("[Stats Summary]")
+    for name, rec in stats.items():
+        if rec.get("skipped"):
+            print(f"  {name:<8} skipped (up to date)")
+            continue
+        line = f"  {name:<8} {rec['tsec']:8.2f}s wall {rec['tcpu']:8.2f}s cpu {rec['prss']:8.1f} MB"
+        if rec["ncll"]:
+            line += f"  {rec['ncll']} LLM calls, {rec['titk']}/{rec['totk']} tokens in/out ({rec['tctk']} cached)"
+        if rec["nlkp"]:
+            line += f"  cache {rec['nhit']}/{rec['nlkp']} hits"
+        print(line)
+    print(f"  Total LLM Calls        : {total['ncll']}")
+    print(f"  Total Time (s)         : {total['tsec']:.2f}")
+    print(f"{'='*50}")
@@ -0,0 +1,31 @@
+# Prompt token counting with the target model's tokenizer (tiktoken for
+# OpenAI models, the HF tokenizer for vLLM-served ones), cached per text.
+# Falls back to the len(text) // 4 estimate when no tokenizer can be loaded.
+
+def load_encoder(model_name):
+    try:
+        if model_name.startswith("gpt"):
+            import tiktoken
+            try:
+                enc = tiktoken.encoding_for_model(model_name)
+            except KeyError:
+                enc = tiktoken.get_encoding("o200k_base")
+            return enc.encode
+        from transformers import AutoTokenizer
+        tok = AutoTokenizer.from_pretrained(model_name)
+        return lambda text: tok.encode(text, add_special_tokens=False)
+    except Exception as e:
+        print(f"[TOKENS] no tokenizer for {model_name} ({type(e).__name__}); using len/4 estimate")
+        return None
+
+class TokenCounter:
+    def __init__(self, model_name):
+        self.encode = load_encoder(model_name)
+        self.cache = {}
+
+    def __call__(self, text):
+        n = self.cache.get(text)
+        if n is None:
+            n = len(self.encode(text)) if self.encode else len(text) // 4
+            n = self.cache[text] = max(1, n)
+        return n
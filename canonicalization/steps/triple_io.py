@@ -0,0 +1,15 @@
+"""
+Row-wise triple files, via the single implementation in
+construction/utils/triple_io.py (imported from the repository root so both
+pipelines read and write exactly the same format).
+"""
+import os
+import sys
+
+_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if _ROOT not in sys.path:
+    sys.path.append(_ROOT)
+
+from construction.utils.triple_io import (
+    FORMAT, VERSION, is_arrow, dumps_row, loads_row, iter_rows, read_rows, TripleWriter, write_rows,
+)
@@ -0,0 +1,58 @@
+"""
+Streaming row-wise triple dedup.
+
+Surface strings are interned once, through the interning shared with the
+construction pipeline (construction/utils/triple_store.py). A case-folded key
+index maps each (h, r, t) key to the interned ids of its first occurrence,
+whose casing is reused across rows (the old `canon` dict). Rows are
+deduplicated and materialized one at a time; no per-occurrence columns are
+kept.
+"""
+import os
+import sys
+
+_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if _ROOT not in sys.path:
+    sys.path.append(_ROOT)
+
+from construction.utils.triple_store import FoldedStrings, fold_key
+
+_SHIFT = 32
+_MASK = (1 << _SHIFT) - 1
+
+
+def _pack(h: int, r: int, t: int) -> int:
+    return (((h << _SHIFT) | r) << _SHIFT) | t
+
+
+def _unpack(key: int):
+    return key >> (2 * _SHIFT), (key >> _SHIFT) & _MASK, key & _MASK
+
+
+class TripleDedup:
+    def __init__(self):
+        self.strings = FoldedStrings()
+        self._first = {}  # packed folded (h, r, t) -> packed surface ids of the first occurrence
+
+    def dedup_row(self, row) -> list:
+        # Deduplicate triples within a row (case-insensitive) and reuse canonical casing across rows
+        if not row or not isinstance(row, list):
+            return []
+
+        intern, fold = self.strings.intern, self.strings.fold
+        s = self.strings.strings
+        seen = set()
+        out = []
+        for tp in row:
+            if not isinstance(tp, (list, tuple)) or len(tp) != 3:
+                continue
+            h, r, t = intern(tp[0]), intern(tp[1]), intern(tp[2])
+
+            key = fold_key(fold, h, r, t)
+            if key in seen:
+                continue
+            seen.add(key)
+
+            h, r, t = _unpack(self._first.setdefault(key, _pack(h, r, t)))
+            out.append([s[h], s[r], s[t]])
+        return out
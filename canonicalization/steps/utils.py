@@ -1,4 +1,4 @@
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
 MODEL_MAP = {
     "gpt": "gpt-5.1-2025-11-13",
@@ -14,3 +14,8 @@ def get_client(api_base=None):
     if api_base:
         return OpenAI(base_url=api_base, api_key="EMPTY")
     return OpenAI()
+
+def get_async_client(api_base=None):
+    if api_base:
+        return AsyncOpenAI(base_url=api_base, api_key="EMPTY")
+    return AsyncOpenAI()
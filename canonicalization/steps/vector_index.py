@@ -0,0 +1,60 @@
+import numpy as np
+
+try:
+    from usearch.index import Index
+except ImportError:
+    Index = None
+
+# Cosine kNN over a pre-normalized pool matrix with removals.
+# Small pools are scanned exactly; larger ones use a usearch HNSW index.
+# With search_mat (e.g. static model2vec vectors), neighbours are found in that
+# space and min_sim is left to the caller, who re-ranks with `similarity`.
+
+EXACT_MAX = 2048
+
+class VectorIndex:
+    def __init__(self, mat, exact_max=EXACT_MAX, search_mat=None):
+        self.mat = mat
+        self.search_mat = mat if search_mat is None else search_mat
+        self.rerank = search_mat is not None
+        self.alive = np.ones(len(mat), dtype=bool)
+        self.n_alive = len(mat)
+        self.ann = None
+
+        if Index is not None and len(mat) > exact_max:
+            self.ann = Index(ndim=self.search_mat.shape[1], metric="cos", dtype="f32")
+            self.ann.add(np.arange(len(mat), dtype=np.uint64), self.search_mat)
+
+    def remove(self, i):
+        if not self.alive[i]:
+            return
+        self.alive[i] = False
+        self.n_alive -= 1
+        if self.ann is not None:
+            self.ann.remove(i)
+
+    def similarity(self, query_id, ids):
+        return self.mat[ids] @ self.mat[query_id]
+
+    def search(self, query_id, k, min_sim=-1.0):
+        # (ids, sims) of up to k live neighbours with sim >= min_sim, best first
+        k = min(k, self.n_alive)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        if self.ann is not None:
+            matches = self.ann.search(self.search_mat[query_id], k)
+            ids = np.asarray(matches.keys, dtype=np.int64)
+            sims = 1.0 - np.asarray(matches.distances, dtype=np.float32)
+        else:
+            ids = np.flatnonzero(self.alive)
+            sims = self.search_mat[ids] @ self.search_mat[query_id]
+            if k < len(ids):
+                top = np.argpartition(-sims, k - 1)[:k]
+                ids, sims = ids[top], sims[top]
+
+        # thresholds are calibrated for `mat`, not for the search space
+        keep = sims >= (-1.0 if self.rerank else min_sim)
+        ids, sims = ids[keep], sims[keep]
+        order = np.argsort(-sims, kind="stable")
+        return ids[order], sims[order]
@@ -9,6 +9,7 @@ from typing import List, Tuple
 from pathlib import Path
 from openai import AsyncOpenAI
 from openai import APIConnectionError, APIError
+from utils.triple_io import TripleWriter
 
 
 def read_jsonl(name: str) -> List[dict]:
@@ -299,7 +300,7 @@ async def process_dataset_async(dataset_name: str, client: AsyncOpenAI, model_na
     tchr = sum(len(t) for t in texts)
     t0 = time.time()
 
-    with open(output_path, "w", encoding="utf-8") as fout:
+    with TripleWriter(output_path) as fout:
         for batch_start in range(0, total_lines, BATCH_SIZE):
             batch_end = min(batch_start + BATCH_SIZE, total_lines)
 
@@ -312,7 +313,7 @@ async def process_dataset_async(dataset_name: str, client: AsyncOpenAI, model_na
             batch_results.sort(key=lambda x: x[0])
 
             for idx, triplets, itk, otk, nc in batch_results:
-                fout.write(json.dumps(triplets, ensure_ascii=False) + "\n")
+                fout.write(triplets)
                 ncll += nc
                 titk += itk
                 totk += otk
@@ -3,6 +3,8 @@ import sys
 import json
 import time
 from verifier import TpRef
+from utils.triple_io import read_rows, write_rows
+from utils.triple_store import TripleStore
 
 
 # Paths will be passed as arguments
@@ -12,28 +14,6 @@ DEFAULT_MODEL = os.getenv("REFINER_MODEL")
 DEFAULT_MAX_TOKENS = os.getenv("REFINER_MAX_TOKENS")
 DEFAULT_HOST = os.getenv("REFINER_HOST", "localhost")
 
-def dedup_row(row, canon):
-    # Deduplicate triples within a row (case-insensitive) and reuse canonical casing across rows
-    if not row or not isinstance(row, list):
-        return []
-    seen = set()
-    out = []
-    for tp in row:
-        if not isinstance(tp, (list, tuple)) or len(tp) != 3:
-            continue
-        s, p, o = tp
-        s = s if isinstance(s, str) else (str(s) if s is not None else "")
-        p = p if isinstance(p, str) else (str(p) if p is not None else "")
-        o = o if isinstance(o, str) else (str(o) if o is not None else "")
-        key = (s.lower(), p.lower(), o.lower())
-        if key in seen:
-            continue
-        seen.add(key)
-        if key not in canon:
-            canon[key] = [s, p, o]
-        out.append(canon[key])
-    return out
-
 def main():
     # Parse command line arguments
     if len(sys.argv) < 5:
@@ -85,8 +65,7 @@ def main():
     with open(src_p, 'r', encoding='utf-8') as f:
         txts = [l.strip() for l in f.readlines()]
     
-    with open(prd_p, 'r', encoding='utf-8') as f:
-        preds = [l.strip() for l in f.readlines()]
+    preds = read_rows(prd_p, on_invalid="none")
     
     lim = int(os.getenv("LIM", "0") or "0")
     if lim > 0:
@@ -103,11 +82,10 @@ def main():
     t0 = time.time()
     outs = ref.proc_batch(txts, preds)
     vtsc = time.time() - t0
-    canon = {}
-
-    with open(triples_p, 'w', encoding='utf-8') as f:
-        for tps in outs:
-            f.write(str(dedup_row(tps, canon)) + '\n')
+    store = TripleStore()
+    for tps in outs:
+        store.add_row(tps)
+    write_rows(triples_p, store.iter_rows())
 
     # Read extractor stats
     exst = {}
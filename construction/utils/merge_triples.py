@@ -1,30 +1,10 @@
 import json
 import sys
 import os
-import ast
 from pathlib import Path
 
-
-def dedup_row(row, canon):
-    if not row or not isinstance(row, list):
-        return []
-    seen = set()
-    out = []
-    for tp in row:
-        if not isinstance(tp, (list, tuple)) or len(tp) != 3:
-            continue
-        s, p, o = tp
-        s = s if isinstance(s, str) else (str(s) if s is not None else "")
-        p = p if isinstance(p, str) else (str(p) if p is not None else "")
-        o = o if isinstance(o, str) else (str(o) if o is not None else "")
-        key = (s.lower(), p.lower(), o.lower())
-        if key in seen:
-            continue
-        seen.add(key)
-        if key not in canon:
-            canon[key] = [s, p, o]
-        out.append(canon[key])
-    return out
+from triple_io import read_rows, write_rows
+from triple_store import TripleStore
 
 
 def merge_triples(input_dir: str, output_dir: str, dataset_name: str):
@@ -34,44 +14,40 @@ def merge_triples(input_dir: str, output_dir: str, dataset_name: str):
         print(f"Error: {triples_file} not found")
         return
 
-    with open(triples_file, 'r', encoding='utf-8') as f:
-        refined_lines = [l.strip() for l in f.readlines()]
+    # read fully before output_file (the same path) is rewritten below
+    refined_rows = read_rows(triples_file, on_invalid="none")
+    output_file = triples_file
 
     article_mapping_file = os.path.join(input_dir, "article_mapping.json")
     if os.path.exists(article_mapping_file):
         with open(article_mapping_file, 'r', encoding='utf-8') as f:
             article_mapping = json.load(f)
 
-        canon = {}
-        article_triples = {}
+        store = TripleStore()
+        article_names = []
         for article_name in sorted(article_mapping.keys()):
             split_indices = article_mapping[article_name]
             merged = []
 
             for split_idx in split_indices:
-                if split_idx < len(refined_lines):
-                    try:
-                        triples = ast.literal_eval(refined_lines[split_idx])
-                        if isinstance(triples, list):
-                            merged.extend(triples)
-                    except (ValueError, SyntaxError):
-                        pass
+                if split_idx < len(refined_rows):
+                    triples = refined_rows[split_idx]
+                    if isinstance(triples, list):
+                        merged.extend(triples)
 
-            article_triples[article_name] = dedup_row(merged, canon)
+            store.add_row(merged)
+            article_names.append(article_name)
 
         os.makedirs(os.path.join(output_dir, dataset_name), exist_ok=True)
 
-        for article_name, triples in article_triples.items():
+        for row_id, article_name in enumerate(article_names):
             article_file = os.path.join(output_dir, dataset_name, f"{article_name}.txt")
-            with open(article_file, 'w', encoding='utf-8') as f:
-                f.write(str(triples) + '\n')
+            write_rows(article_file, [store.get_row(row_id)])
 
-        with open(output_file, 'w', encoding='utf-8') as f:
-            for triples in article_triples.values():
-                f.write(str(triples) + '\n')
+        write_rows(output_file, store.iter_rows())
 
-        print(f"Merged {len(article_triples)} articles from {len(refined_lines)} split lines")
-        print(f"Saved {len(article_triples)} article files to: {os.path.join(output_dir, dataset_name)}/")
+        print(f"Merged {len(article_names)} articles from {len(refined_rows)} split lines")
+        print(f"Saved {len(article_names)} article files to: {os.path.join(output_dir, dataset_name)}/")
         print(f"Saved combined triples to: {output_file}")
     else:
         mapping_file = os.path.join(input_dir, "mapping.json")
@@ -82,29 +58,23 @@ def merge_triples(input_dir: str, output_dir: str, dataset_name: str):
         with open(mapping_file, 'r', encoding='utf-8') as f:
             mapping = json.load(f)
 
-        canon = {}
-        merged_triples = []
+        store = TripleStore()
         for orig_idx in sorted([int(k) for k in mapping.keys()]):
             split_indices = mapping[str(orig_idx)]
             merged = []
 
             for split_idx in split_indices:
-                if split_idx < len(refined_lines):
-                    try:
-                        triples = ast.literal_eval(refined_lines[split_idx])
-                        if isinstance(triples, list):
-                            merged.extend(triples)
-                    except (ValueError, SyntaxError):
-                        pass
+                if split_idx < len(refined_rows):
+                    triples = refined_rows[split_idx]
+                    if isinstance(triples, list):
+                        merged.extend(triples)
 
-            merged_triples.append(dedup_row(merged, canon))
+            store.add_row(merged)
 
         os.makedirs(os.path.dirname(output_file), exist_ok=True)
-        with open(output_file, 'w', encoding='utf-8') as f:
-            for triples in merged_triples:
-                f.write(str(triples) + '\n')
+        write_rows(output_file, store.iter_rows())
 
-        print(f"Merged {len(merged_triples)} lines from {len(refined_lines)} split lines")
+        print(f"Merged {store.n_rows} lines from {len(refined_rows)} split lines")
         print(f"Saved merged triples to: {output_file}")
 
 
@@ -0,0 +1,226 @@
+"""
+Row-wise triple interchange format shared by every pipeline stage.
+
+A triple file holds one row of [head, relation, tail] triples per source line.
+The encoding is picked from the file suffix:
+
+- JSONL (default): a version header line, then one JSON array per row.
+- Parquet (.parquet) / Arrow IPC (.arrow): row_id + list<struct<h, r, t>>,
+  plus a nullable `raw` column holding the JSON row when it is not a list of
+  string triples (malformed extractor output), so both encodings round-trip
+  the same rows.
+
+This is the single implementation: canonicalization/steps/triple_io.py and
+evaluate/common/graph/io.py import it.
+
+Readers auto-detect headerless JSON lines and the legacy Python-repr
+format (`str(list)` per line), so older files keep working.
+"""
+import ast
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+FORMAT = "unikg-triples"
+VERSION = 1
+ARROW_SUFFIXES = (".parquet", ".arrow")
+ARROW_BATCH_ROWS = 4096
+
+
+def _dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def _loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def is_arrow(path) -> bool:
+    return str(path).lower().endswith(ARROW_SUFFIXES)
+
+
+def dumps_row(row) -> str:
+    return _dumps(row).decode("utf-8")
+
+
+def loads_row(line):
+    # JSON first (fast path), legacy Python repr as fallback
+    try:
+        return _loads(line)
+    except ValueError:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        return ast.literal_eval(line)
+
+
+def _check_header(header, path):
+    if not isinstance(header, dict) or header.get("format") != FORMAT:
+        raise ValueError(f"{path}: not a {FORMAT} file")
+    version = int(header.get("version", 0))
+    if version > VERSION:
+        raise ValueError(f"{path}: {FORMAT} version {version} is newer than supported ({VERSION})")
+
+
+def _arrow_schema():
+    import pyarrow as pa
+
+    triple = pa.struct([("h", pa.string()), ("r", pa.string()), ("t", pa.string())])
+    return pa.schema(
+        [("row_id", pa.int64()), ("triples", pa.list_(triple)), ("raw", pa.string())],
+        metadata={"format": FORMAT, "version": str(VERSION)},
+    )
+
+
+def _iter_arrow_rows(path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if str(path).lower().endswith(".parquet"):
+        pf = pq.ParquetFile(path)
+        schema = pf.schema_arrow
+        cols = [c for c in ("triples", "raw") if c in schema.names]
+        batches = pf.iter_batches(columns=cols)
+    else:
+        reader = pa.ipc.open_file(path)
+        schema = reader.schema
+        cols = [c for c in ("triples", "raw") if c in schema.names]
+        batches = (reader.get_batch(i).select(cols) for i in range(reader.num_record_batches))
+
+    _check_header({k.decode(): v.decode() for k, v in (schema.metadata or {}).items()}, path)
+
+    for batch in batches:
+        triples = batch.column(0).to_pylist()
+        raws = batch.column(1).to_pylist() if len(cols) > 1 else [None] * len(triples)
+        for row, raw in zip(triples, raws):
+            if raw is not None:
+                yield _loads(raw)
+            else:
+                yield [[tp["h"], tp["r"], tp["t"]] for tp in row or []]
+
+
+def iter_rows(path, on_invalid="raise"):
+    """
+    Yield one list of triples per row.
+
+    on_invalid controls blank or unparsable lines:
+    - "raise": raise ValueError on unparsable lines, skip blank lines
+    - "skip" : skip them
+    - "none" : yield None in their place (keeps row alignment)
+    """
+    if is_arrow(path):
+        yield from _iter_arrow_rows(path)
+        return
+
+    with open(path, "rb") as f:
+        for line_num, line in enumerate(f):
+            line = line.strip()
+
+            if line_num == 0 and line.startswith(b"{"):
+                _check_header(_loads(line), path)
+                continue
+
+            if not line:
+                if on_invalid == "none":
+                    yield None
+                continue
+
+            try:
+                row = loads_row(line)
+            except (ValueError, SyntaxError):
+                if on_invalid == "raise":
+                    raise ValueError(f"{path}:{line_num + 1}: unparsable row")
+                if on_invalid == "none":
+                    yield None
+                continue
+
+            yield row
+
+
+def read_rows(path, on_invalid="raise"):
+    return list(iter_rows(path, on_invalid))
+
+
+def _is_string_triples(row) -> bool:
+    return isinstance(row, (list, tuple)) and all(
+        isinstance(tp, (list, tuple)) and len(tp) == 3 and all(isinstance(x, str) for x in tp)
+        for tp in row
+    )
+
+
+class TripleWriter:
+    def __init__(self, path):
+        self.path = str(path)
+        self.arrow = is_arrow(path)
+        self.n_rows = 0
+        self._buf = []
+        self._writer = None
+        self._f = None
+
+        if not self.arrow:
+            self._f = open(self.path, "wb")
+            self._f.write(_dumps({"format": FORMAT, "version": VERSION}) + b"\n")
+
+    def write(self, row):
+        if self.arrow:
+            self._buf.append(row if row is not None else [])
+            if len(self._buf) >= ARROW_BATCH_ROWS:
+                self._flush_arrow()
+        else:
+            self._f.write(_dumps(row if row is not None else []) + b"\n")
+        self.n_rows += 1
+
+    def _flush_arrow(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = _arrow_schema()
+        first = self.n_rows - len(self._buf)
+        triples, raws = [], []
+        for row in self._buf:
+            if _is_string_triples(row):
+                triples.append([{"h": tp[0], "r": tp[1], "t": tp[2]} for tp in row])
+                raws.append(None)
+            else:
+                # kept as written, exactly like the JSONL path
+                triples.append([])
+                raws.append(_dumps(row).decode("utf-8"))
+        table = pa.table(
+            {"row_id": list(range(first, first + len(self._buf))), "triples": triples, "raw": raws},
+            schema=schema,
+        )
+
+        if self._writer is None:
+            if self.path.lower().endswith(".parquet"):
+                self._writer = pq.ParquetWriter(self.path, schema)
+            else:
+                self._writer = pa.ipc.new_file(self.path, schema)
+        self._writer.write_table(table)
+        self._buf = []
+
+    def close(self):
+        if self.arrow:
+            if self._buf or self._writer is None:
+                self._flush_arrow()
+            self._writer.close()
+        else:
+            self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_rows(path, rows):
+    with TripleWriter(path) as w:
+        for row in rows:
+            w.write(row)
+    return w.n_rows
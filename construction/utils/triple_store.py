@@ -0,0 +1,119 @@
+"""
+Compact row-wise triple store.
+
+Surface strings are interned once; triples live in int32 `array` columns
+(h, r, t), with each row's offset in `_row_start`. A case-folded key index
+maps each (h, r, t) key to the first occurrence, whose casing is reused across
+rows (the old `canon` dict). Strings are only materialized when rows are read
+back. StringTable / FoldedStrings are shared with the canonicalization step1
+(canonicalization/steps/triple_store.py).
+"""
+from array import array
+
+_SHIFT = 32
+
+
+class StringTable:
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+
+    def intern(self, s: str) -> int:
+        sid = self.ids.get(s)
+        if sid is None:
+            sid = len(self.strings)
+            self.ids[s] = sid
+            self.strings.append(s)
+        return sid
+
+    def __getitem__(self, sid: int) -> str:
+        return self.strings[sid]
+
+    def __len__(self):
+        return len(self.strings)
+
+
+class FoldedStrings(StringTable):
+    """Interned surface strings, each with the id of its case-folded form."""
+
+    def __init__(self):
+        super().__init__()
+        self.folded = StringTable()
+        self.fold = array("i")  # surface id -> case-folded id
+
+    def intern(self, x) -> int:
+        s = x if isinstance(x, str) else (str(x) if x is not None else "")
+        sid = self.ids.get(s)
+        if sid is None:
+            sid = super().intern(s)
+            low = s.lower()
+            self.fold.append(self.folded.intern(s if low == s else low))
+        return sid
+
+
+def fold_key(fold, h: int, r: int, t: int) -> int:
+    # packed case-folded (h, r, t) key
+    return (((fold[h] << _SHIFT) | fold[r]) << _SHIFT) | fold[t]
+
+
+class TripleStore:
+    def __init__(self):
+        self.strings = FoldedStrings()
+        self.h = array("i")
+        self.r = array("i")
+        self.t = array("i")
+
+        self._keys = {}               # packed folded (h, r, t) -> first occurrence
+        self._row_start = array("i")  # row -> first occurrence offset
+
+    def add_row(self, row) -> int:
+        # Deduplicate triples within a row (case-insensitive) and reuse canonical casing across rows
+        row_id = len(self._row_start)
+        self._row_start.append(len(self.h))
+
+        if not row or not isinstance(row, list):
+            return row_id
+
+        intern, fold = self.strings.intern, self.strings.fold
+        seen = set()
+        for tp in row:
+            if not isinstance(tp, (list, tuple)) or len(tp) != 3:
+                continue
+            h, r, t = intern(tp[0]), intern(tp[1]), intern(tp[2])
+
+            key = fold_key(fold, h, r, t)
+            if key in seen:
+                continue
+            seen.add(key)
+
+            first = self._keys.get(key)
+            if first is None:
+                self._keys[key] = len(self.h)
+            else:
+                h, r, t = self.h[first], self.r[first], self.t[first]
+
+            self.h.append(h)
+            self.r.append(r)
+            self.t.append(t)
+
+        return row_id
+
+    @property
+    def n_rows(self) -> int:
+        return len(self._row_start)
+
+    def __len__(self):
+        return len(self.h)
+
+    def row_ids(self, row_id: int):
+        start = self._row_start[row_id]
+        end = self._row_start[row_id + 1] if row_id + 1 < self.n_rows else len(self.h)
+        return range(start, end)
+
+    def get_row(self, row_id: int) -> list:
+        s = self.strings.strings
+        return [[s[self.h[i]], s[self.r[i]], s[self.t[i]]] for i in self.row_ids(row_id)]
+
+    def iter_rows(self):
+        for row_id in range(self.n_rows):
+            yield self.get_row(row_id)
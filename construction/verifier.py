@@ -6,6 +6,7 @@ import threading
 from pathlib import Path
 from openai import OpenAI
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from utils.triple_io import loads_row
 
 
 def verifier_get_refine_examples():
@@ -86,17 +87,26 @@ class TpRefBase:
 
         return True
 
+    def _parse_pred(self, pstr):
+        # predictions arrive either already parsed (triple_io rows) or as raw lines
+        if isinstance(pstr, list):
+            return pstr
+        return loads_row(str(pstr).strip())
+
     def _is_empty(self, pstr):
         if pstr is None:
             return True
 
+        if isinstance(pstr, list):
+            return not pstr or pstr == [[]]
+
         pstr = str(pstr).strip()
 
         if not pstr or pstr == "" or pstr == "[]" or pstr == "[[]]":
             return True
 
         try:
-            pred = ast.literal_eval(pstr)
+            pred = self._parse_pred(pstr)
             if not pred or pred == [] or pred == [[]]:
                 return True
         except:
@@ -136,7 +146,7 @@ class TpRefBase:
                 stat = "extracted" if tps else "fail"
                 return idx, tps if tps else [], stat
 
-            pred = ast.literal_eval(pstr)
+            pred = self._parse_pred(pstr)
 
             if not pred or pred == [] or pred == [[]]:
                 print(f"[{idx}] Parsed empty - extracting", flush=True)
@@ -162,7 +172,7 @@ class TpRefBase:
                 return idx, tps, "err_extr"
 
             try:
-                pred = ast.literal_eval(pstr)
+                pred = self._parse_pred(pstr)
                 norm = self._norm(pred)
                 if self._val(norm):
                     return idx, norm, "err_norm"
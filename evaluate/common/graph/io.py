@@ -2,6 +2,10 @@ import ast
 import re
 from typing import List
 
+# Row-wise triple files are read through the one shared implementation
+# (versioned JSONL, Parquet/Arrow and legacy str(list) lines)
+from construction.utils.triple_io import iter_rows
+
 
 def _clean_line(line: str) -> str:
     line = re.sub(r'",\s*"([^"]+)"\s+([a-zA-Z]+)\s+"([^"]+)"\]', r'", "\1 \2 \3"]', line)
@@ -41,30 +45,15 @@ def load_flat(path: str) -> List[List[str]]:
 
 
 def load_lines(path: str) -> List[List[List[str]]]:
-    res = []
-    with open(path, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            res.append(ast.literal_eval(line))
-    return res
+    # blank lines are skipped; an unparsable line raises ValueError
+    return list(iter_rows(path, on_invalid="raise"))
 
 
 def load_lines_safe(path: str) -> List[List[List[str]]]:
     res: List[List[List[str]]] = []
-    with open(path, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                res.append([["error", "error", "error"]])
-                continue
-            try:
-                data = ast.literal_eval(line)
-                if not data or data == []:
-                    res.append([["error", "error", "error"]])
-                else:
-                    res.append(data)
-            except Exception:
-                res.append([["error", "error", "error"]])
+    for row in iter_rows(path, on_invalid="none"):
+        if not row:
+            res.append([["error", "error", "error"]])
+        else:
+            res.append(row)
     return res